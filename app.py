@@ -1,12 +1,15 @@
 # app.py
 # Ponto de entrada principal do Modbus TCP Manager
 
-from flask import Flask, send_from_directory
+from flask import Flask, g, request, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import logging
 import os
+from array import array
 from config import flask_config, logging_config
 from backend.routes import api_bp
+from backend import profiler
 
 # Configuração de logging
 logging.basicConfig(
@@ -17,9 +20,24 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class ModbusJSONProvider(DefaultJSONProvider):
+    """Provedor JSON que serializa os arrays entregues pelo codec enxuto"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, array):
+            return o.tolist()
+        return DefaultJSONProvider.default(o)
+    
+    def dumps(self, obj, **kwargs):
+        with profiler.span('json.encode'):
+            return super().dumps(obj, **kwargs)
+
+
 def create_app() -> Flask:
     """Cria e configura a aplicação Flask"""
     app = Flask(__name__)
+    app.json = ModbusJSONProvider(app)
     app.config['SECRET_KEY'] = flask_config.SECRET_KEY
     
     # Habilitar CORS
@@ -28,6 +46,21 @@ def create_app() -> Flask:
     # Registrar blueprints
     app.register_blueprint(api_bp)
     
+    # Ganchos do perfilamento sob demanda (custo de uma checagem quando desligado)
+    @app.before_request
+    def profile_request_start():
+        profiler.begin_request()
+        if profiler.state.spans:
+            g.profile_span = profiler.span(f"route {request.endpoint}")
+            g.profile_span.__enter__()
+    
+    @app.teardown_request
+    def profile_request_end(exc):
+        profile_span = g.pop('profile_span', None)
+        if profile_span is not None:
+            profile_span.__exit__(None, None, None)
+        profiler.end_request()
+    
     # Rotas para servir arquivos estáticos do frontend
     @app.route('/')
     def index():
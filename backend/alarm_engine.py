@@ -0,0 +1,352 @@
+# backend/alarm_engine.py
+# Motor incremental de alarmes e condições sobre os valores lidos
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from config import alarm_config, modbus_config
+
+logger = logging.getLogger(__name__)
+
+# Tabelas de dados alimentadas pelo caminho de aquisição
+TABLE_HOLDING_REGISTERS = 'holding_registers'
+TABLE_COILS = 'coils'
+TABLES = (TABLE_HOLDING_REGISTERS, TABLE_COILS)
+
+# Tipos de regra suportados
+KIND_THRESHOLD = 'threshold'
+KIND_RATE = 'rate'
+KIND_BITMASK = 'bitmask'
+KINDS = (KIND_THRESHOLD, KIND_RATE, KIND_BITMASK)
+
+
+@dataclass
+class AlarmRule:
+    """Definição de uma regra de alarme sobre um endereço"""
+    rule_id: str
+    table: str
+    address: int
+    kind: str
+    unit_id: int = modbus_config.DEFAULT_UNIT_ID
+    high: Optional[float] = None
+    low: Optional[float] = None
+    max_rate: Optional[float] = None
+    mask: int = 0xFFFF
+    pattern: int = 0
+    hysteresis: float = 0.0
+    delay_on: float = 0.0
+    delay_off: float = 0.0
+    message: str = ''
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AlarmRule':
+        """
+        Cria e valida uma regra a partir de um dicionário (JSON da API)
+
+        Raises:
+            ValueError: Se a definição da regra for inválida
+        """
+        try:
+            rule = cls(
+                rule_id=str(data['rule_id']),
+                table=data.get('table', TABLE_HOLDING_REGISTERS),
+                address=int(data['address']),
+                kind=data['kind'],
+                unit_id=int(data.get('unit_id', modbus_config.DEFAULT_UNIT_ID)),
+                high=None if data.get('high') is None else float(data['high']),
+                low=None if data.get('low') is None else float(data['low']),
+                max_rate=None if data.get('max_rate') is None else float(data['max_rate']),
+                mask=int(data.get('mask', 0xFFFF)),
+                pattern=int(data.get('pattern', 0)),
+                hysteresis=float(data.get('hysteresis', 0.0)),
+                delay_on=float(data.get('delay_on', 0.0)),
+                delay_off=float(data.get('delay_off', 0.0)),
+                message=str(data.get('message', ''))
+            )
+        except KeyError as e:
+            raise ValueError(f"Campo obrigatório ausente: {e.args[0]}")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Valor inválido na regra: {e}")
+
+        if rule.table not in TABLES:
+            raise ValueError(f"Tabela inválida. Deve ser uma de {', '.join(TABLES)}")
+        if rule.kind not in KINDS:
+            raise ValueError(f"Tipo inválido. Deve ser um de {', '.join(KINDS)}")
+        if rule.address < 0:
+            raise ValueError("Endereço deve ser positivo")
+        if not 0 <= rule.unit_id <= modbus_config.MAX_UNIT_ID:
+            raise ValueError(f"Unit ID deve estar entre 0 e {modbus_config.MAX_UNIT_ID}")
+        if rule.kind == KIND_THRESHOLD and rule.high is None and rule.low is None:
+            raise ValueError("Regra de limite exige 'high' e/ou 'low'")
+        if rule.kind == KIND_RATE and (rule.max_rate is None or rule.max_rate <= 0):
+            raise ValueError("Regra de taxa exige 'max_rate' positivo")
+        if rule.hysteresis < 0 or rule.delay_on < 0 or rule.delay_off < 0:
+            raise ValueError("Histerese e atrasos não podem ser negativos")
+        return rule
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _RuleState:
+    """Estado de avaliação de uma regra entre amostras"""
+    __slots__ = ('condition', 'active', 'pending_since', 'rate', 'value', 'since')
+
+    def __init__(self):
+        self.condition = False
+        self.active = False
+        self.pending_since: Optional[float] = None
+        self.rate = 0.0
+        self.value: Optional[float] = None
+        self.since: Optional[float] = None
+
+
+class AlarmEngine:
+    """
+    Motor de alarmes indexado por endereço
+
+    Cada amostra recebida só avalia as regras dos endereços que mudaram,
+    além das regras "quentes" (com temporizador pendente ou taxa não nula).
+    O custo por ciclo escala com o número de mudanças, não com regras × tags.
+    """
+
+    def __init__(self, max_events: int = None):
+        self._lock = threading.Lock()
+        self._events_changed = threading.Condition(self._lock)
+        self._rules: Dict[str, AlarmRule] = {}
+        self._states: Dict[str, _RuleState] = {}
+        self._index: Dict[Tuple[int, str, int], List[AlarmRule]] = {}
+        self._values: Dict[Tuple[int, str, int], Tuple[float, float]] = {}
+        self._hot: Set[str] = set()
+        self._events: deque = deque(maxlen=max_events or alarm_config.MAX_EVENTS)
+        self._sequence = 0
+
+    # ------------------------------------------------------------------
+    # Gerenciamento de regras
+    # ------------------------------------------------------------------
+
+    def add_rule(self, rule: AlarmRule) -> None:
+        """Adiciona ou substitui uma regra"""
+        with self._lock:
+            if rule.rule_id in self._rules:
+                self._remove_locked(rule.rule_id)
+
+            self._rules[rule.rule_id] = rule
+            self._states[rule.rule_id] = _RuleState()
+            self._index.setdefault(self._key(rule), []).append(rule)
+
+            # Avaliar imediatamente contra o último valor conhecido (outra regra no mesmo endereço);
+            # sem ele, a regra é avaliada na próxima amostra
+            last = self._values.get(self._key(rule))
+            if last is not None:
+                self._evaluate(rule, last[0], None, last[1], time.time())
+
+        logger.info(f"🔔 Regra de alarme '{rule.rule_id}' registrada em {rule.table}[{rule.address}]")
+
+    def remove_rule(self, rule_id: str) -> bool:
+        """Remove uma regra; retorna False se ela não existir"""
+        with self._lock:
+            if rule_id not in self._rules:
+                return False
+            self._remove_locked(rule_id)
+        logger.info(f"🔕 Regra de alarme '{rule_id}' removida")
+        return True
+
+    def _remove_locked(self, rule_id: str) -> None:
+        rule = self._rules.pop(rule_id)
+        self._states.pop(rule_id, None)
+        self._hot.discard(rule_id)
+        key = self._key(rule)
+        rules = [r for r in self._index.get(key, []) if r.rule_id != rule_id]
+        if rules:
+            self._index[key] = rules
+        else:
+            self._index.pop(key, None)
+            self._values.pop(key, None)
+
+    @staticmethod
+    def _key(rule: AlarmRule) -> Tuple[int, str, int]:
+        return (rule.unit_id, rule.table, rule.address)
+
+    def list_rules(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [rule.to_dict() for rule in self._rules.values()]
+
+    # ------------------------------------------------------------------
+    # Alimentação pelo caminho de aquisição
+    # ------------------------------------------------------------------
+
+    def process(self, table: str, start_address: int, values: Sequence[Any],
+                unit_id: int = None, timestamp: float = None) -> None:
+        """
+        Processa uma amostra lida do dispositivo
+
+        Args:
+            table: Tabela de origem (holding_registers ou coils)
+            start_address: Endereço do primeiro valor
+            values: Valores lidos, na ordem dos endereços
+            unit_id: Unidade de origem (padrão: modbus_config.DEFAULT_UNIT_ID)
+            timestamp: Instante da leitura (padrão: agora)
+        """
+        now = time.time() if timestamp is None else timestamp
+        if unit_id is None:
+            unit_id = modbus_config.DEFAULT_UNIT_ID
+        end_address = start_address + len(values)
+
+        with self._lock:
+            evaluated: Set[str] = set()
+
+            for offset, raw in enumerate(values):
+                key = (unit_id, table, start_address + offset)
+                rules = self._index.get(key)
+                if not rules:
+                    # Só endereços com regras são guardados: a memória escala com as regras, não com as leituras
+                    continue
+
+                value = float(raw)
+                previous = self._values.get(key)
+                # A taxa é medida desde a última amostra, não desde a última mudança
+                self._values[key] = (value, now)
+                if previous is not None and previous[0] == value:
+                    continue
+
+                for rule in rules:
+                    self._evaluate(rule, value, previous, now, now)
+                    evaluated.add(rule.rule_id)
+
+            # Regras quentes: temporizadores pendentes ou taxa não nula
+            for rule_id in list(self._hot - evaluated):
+                rule = self._rules[rule_id]
+                state = self._states[rule_id]
+                sampled = (
+                    rule.unit_id == unit_id and rule.table == table
+                    and start_address <= rule.address < end_address
+                )
+                if sampled and rule.kind == KIND_RATE:
+                    # Endereço lido sem mudança: taxa nula desde a última amostra
+                    state.rate = 0.0
+                    state.condition = self._rate_condition(rule, state)
+                self._apply(rule, state, state.condition, now)
+
+    def _evaluate(self, rule: AlarmRule, value: float,
+                  previous: Optional[Tuple[float, float]], sample_time: float, now: float) -> None:
+        state = self._states[rule.rule_id]
+        state.value = value
+
+        if rule.kind == KIND_THRESHOLD:
+            condition = self._threshold_condition(rule, state, value)
+        elif rule.kind == KIND_RATE:
+            if previous is not None and sample_time > previous[1]:
+                state.rate = (value - previous[0]) / (sample_time - previous[1])
+            else:
+                state.rate = 0.0
+            condition = self._rate_condition(rule, state)
+        else:
+            condition = (int(value) & rule.mask) == rule.pattern
+
+        state.condition = condition
+        self._apply(rule, state, condition, now)
+
+    @staticmethod
+    def _threshold_condition(rule: AlarmRule, state: _RuleState, value: float) -> bool:
+        # A histerese afasta o ponto de retorno do limite enquanto o alarme está ativo
+        band = rule.hysteresis if state.active else 0.0
+        if rule.high is not None and value > rule.high - band:
+            return True
+        if rule.low is not None and value < rule.low + band:
+            return True
+        return False
+
+    @staticmethod
+    def _rate_condition(rule: AlarmRule, state: _RuleState) -> bool:
+        band = rule.hysteresis if state.active else 0.0
+        return abs(state.rate) > rule.max_rate - band
+
+    def _apply(self, rule: AlarmRule, state: _RuleState, condition: bool, now: float) -> None:
+        """Aplica os temporizadores de atraso e publica transições"""
+        if condition == state.active:
+            state.pending_since = None
+        else:
+            if state.pending_since is None:
+                state.pending_since = now
+            delay = rule.delay_on if condition else rule.delay_off
+            if now - state.pending_since >= delay:
+                state.active = condition
+                state.pending_since = None
+                state.since = now
+                self._publish(rule, state, now)
+
+        if state.pending_since is not None or (rule.kind == KIND_RATE and state.rate != 0.0):
+            self._hot.add(rule.rule_id)
+        else:
+            self._hot.discard(rule.rule_id)
+
+    def _publish(self, rule: AlarmRule, state: _RuleState, now: float) -> None:
+        self._sequence += 1
+        event = {
+            "sequence": self._sequence,
+            "rule_id": rule.rule_id,
+            "unit_id": rule.unit_id,
+            "table": rule.table,
+            "address": rule.address,
+            "state": "active" if state.active else "cleared",
+            "value": state.value,
+            "timestamp": now,
+            "message": rule.message
+        }
+        self._events.append(event)
+        self._events_changed.notify_all()
+
+        if state.active:
+            logger.warning(f"🚨 Alarme '{rule.rule_id}' ativo em {rule.table}[{rule.address}] = {state.value}")
+        else:
+            logger.info(f"✅ Alarme '{rule.rule_id}' normalizado em {rule.table}[{rule.address}] = {state.value}")
+
+    # ------------------------------------------------------------------
+    # Consulta e publicação
+    # ------------------------------------------------------------------
+
+    def active_alarms(self) -> List[Dict[str, Any]]:
+        """Retorna os alarmes atualmente ativos"""
+        with self._lock:
+            return [
+                {
+                    "rule_id": rule_id,
+                    "unit_id": self._rules[rule_id].unit_id,
+                    "table": self._rules[rule_id].table,
+                    "address": self._rules[rule_id].address,
+                    "value": state.value,
+                    "since": state.since,
+                    "message": self._rules[rule_id].message
+                }
+                for rule_id, state in self._states.items() if state.active
+            ]
+
+    def events_since(self, sequence: int = 0) -> List[Dict[str, Any]]:
+        """Retorna as transições com número de sequência maior que `sequence`"""
+        with self._lock:
+            return [event for event in self._events if event["sequence"] > sequence]
+
+    def stream(self, sequence: int = 0, timeout: float = None) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Gera as transições à medida que são publicadas
+
+        Produz None a cada `timeout` segundos sem eventos, permitindo ao
+        consumidor enviar keep-alives e detectar desconexões.
+        """
+        timeout = timeout or alarm_config.STREAM_KEEPALIVE
+        while True:
+            with self._lock:
+                self._events_changed.wait_for(lambda: self._sequence > sequence, timeout=timeout)
+                pending = [event for event in self._events if event["sequence"] > sequence]
+
+            if not pending:
+                yield None
+                continue
+
+            for event in pending:
+                sequence = event["sequence"]
+                yield event
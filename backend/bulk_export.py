@@ -0,0 +1,216 @@
+# backend/bulk_export.py
+# Exportação em massa da memória do dispositivo, em fluxo (CSV ou NDJSON)
+
+import base64
+import binascii
+import json
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+from config import export_config, modbus_config
+from backend.alarm_engine import TABLE_COILS, TABLE_HOLDING_REGISTERS, TABLES
+
+logger = logging.getLogger(__name__)
+
+# Formatos de saída
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+FORMATS = (FORMAT_CSV, FORMAT_NDJSON)
+
+CSV_HEADER = 'table,unit_id,address,value\n'
+
+
+@dataclass
+class ExportRequest:
+    """Faixa de endereços a exportar e a posição de retomada"""
+    tables: Tuple[str, ...]
+    start_address: int
+    count: int
+    unit_id: int
+    # Posição de retomada (índice da tabela e próximo endereço)
+    table_index: int = 0
+    next_address: Optional[int] = None
+
+    @classmethod
+    def from_args(cls, args: Mapping[str, Any], default_unit_id: int) -> 'ExportRequest':
+        """
+        Cria e valida a exportação a partir dos parâmetros da API
+
+        Um parâmetro 'token' retoma uma exportação interrompida e dispensa os demais.
+
+        Raises:
+            ValueError: Se a faixa ou o token forem inválidos
+        """
+        token = args.get('token')
+        if token:
+            return cls.from_token(token)
+
+        try:
+            export = cls(
+                tables=tuple(table.strip() for table in str(args.get('tables', TABLE_HOLDING_REGISTERS)).split(',')),
+                start_address=int(args.get('start_address', 0)),
+                count=int(args.get('count', export_config.MAX_ADDRESS)),
+                unit_id=int(args.get('unit_id', default_unit_id))
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Valor inválido na exportação: {e}")
+
+        export.validate()
+        return export
+
+    @classmethod
+    def from_token(cls, token: str) -> 'ExportRequest':
+        """
+        Reconstrói a exportação a partir de um token de continuação
+
+        Raises:
+            ValueError: Se o token for inválido
+        """
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            export = cls(
+                tables=tuple(data['tables']),
+                start_address=int(data['start_address']),
+                count=int(data['count']),
+                unit_id=int(data['unit_id']),
+                table_index=int(data['table_index']),
+                next_address=int(data['next_address'])
+            )
+        except (binascii.Error, UnicodeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Token de continuação inválido: {e}")
+
+        export.validate()
+        return export
+
+    def validate(self) -> None:
+        if not self.tables or any(table not in TABLES for table in self.tables):
+            raise ValueError(f"Tabela inválida. Deve ser uma de {', '.join(TABLES)}")
+        if self.start_address < 0 or self.count <= 0:
+            raise ValueError("Endereço inicial deve ser positivo e a quantidade maior que zero")
+        if self.end_address > export_config.MAX_ADDRESS:
+            raise ValueError(f"A faixa exportada deve terminar até o endereço {export_config.MAX_ADDRESS - 1}")
+        if not 0 <= self.unit_id <= modbus_config.MAX_UNIT_ID:
+            raise ValueError(f"Unit ID deve estar entre 0 e {modbus_config.MAX_UNIT_ID}")
+        if not 0 <= self.table_index < len(self.tables):
+            raise ValueError("Posição de retomada fora da exportação")
+        if self.next_address is not None and not self.start_address <= self.next_address < self.end_address:
+            raise ValueError("Posição de retomada fora da exportação")
+
+    @property
+    def end_address(self) -> int:
+        return self.start_address + self.count
+
+    @property
+    def is_resumed(self) -> bool:
+        return self.next_address is not None
+
+    def token(self, table_index: int, next_address: int) -> str:
+        """Token de continuação para retomar a exportação na posição indicada"""
+        data = asdict(self)
+        data.update(table_index=table_index, next_address=next_address)
+        encoded = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('ascii'))
+        return encoded.decode('ascii').rstrip('=')
+
+    def blocks(self) -> Iterator[Tuple[int, str, int, int]]:
+        """Percorre a faixa em blocos do maior tamanho aceito por requisição Modbus"""
+        for table_index in range(self.table_index, len(self.tables)):
+            table = self.tables[table_index]
+            size = export_config.BLOCK_COILS if table == TABLE_COILS else export_config.BLOCK_REGISTERS
+            address = self.start_address
+            if table_index == self.table_index and self.next_address is not None:
+                address = self.next_address
+            while address < self.end_address:
+                count = min(size, self.end_address - address)
+                yield table_index, table, address, count
+                address += count
+
+    def position_after(self, table_index: int, address: int, count: int) -> Optional[Tuple[int, int]]:
+        """Posição seguinte a um bloco (None ao fim da exportação)"""
+        if address + count < self.end_address:
+            return table_index, address + count
+        if table_index + 1 < len(self.tables):
+            return table_index + 1, self.start_address
+        return None
+
+
+def _csv_rows(table: str, unit_id: int, address: int, count: int, values: Optional[Sequence[int]]) -> str:
+    prefix = f"{table},{unit_id},"
+    if values is None:
+        # Bloco recusado pelo dispositivo (ex.: endereço não mapeado): valores vazios
+        return ''.join(f"{prefix}{address + offset},\n" for offset in range(count))
+    return ''.join(f"{prefix}{address + offset},{int(value)}\n" for offset, value in enumerate(values))
+
+
+def export_stream(manager, export: ExportRequest, output_format: str = FORMAT_CSV) -> Iterator[str]:
+    """
+    Lê a faixa bloco a bloco e gera a saída conforme é lida
+
+    A memória usada não depende do tamanho da faixa: a cada
+    export_config.FLUSH_BLOCKS blocos o texto acumulado é entregue ao cliente,
+    seguido no CSV de uma linha "# next=<token>" com o ponto de retomada.
+    Blocos recusados pelo dispositivo (exceção Modbus) saem sem valores; uma
+    falha de comunicação encerra a exportação com um token de continuação.
+
+    Args:
+        manager: ModbusManager (ou dispositivo compatível) conectado
+        export: Faixa de endereços e posição de retomada
+        output_format: FORMAT_CSV ou FORMAT_NDJSON
+
+    Yields:
+        str: Trechos do arquivo exportado
+    """
+    ndjson = output_format == FORMAT_NDJSON
+    pending: List[str] = []
+    if not ndjson and not export.is_resumed:
+        pending.append(CSV_HEADER)
+
+    exported = 0
+    for block_number, (table_index, table, address, count) in enumerate(export.blocks(), start=1):
+        # Leitura em massa não alimenta o ouvinte de amostras (motor de alarmes)
+        if table == TABLE_COILS:
+            result = manager.read_coils(address, count, export.unit_id, notify=False)
+        else:
+            result = manager.read_holding_registers(address, count, export.unit_id, notify=False)
+
+        if not result["success"] and not result.get("device_error"):
+            token = export.token(table_index, address)
+            logger.error(f"❌ Exportação interrompida em {table}:{address}: {result['error']}")
+            if ndjson:
+                pending.append(json.dumps({"complete": False, "error": result["error"], "next": token}, separators=(',', ':')) + '\n')
+            else:
+                pending.append(f"# next={token}\n")
+            yield ''.join(pending)
+            return
+
+        values = result["data"] if result["success"] else None
+        if ndjson:
+            position = export.position_after(table_index, address, count)
+            record: Dict[str, Any] = {
+                "table": table,
+                "unit_id": export.unit_id,
+                "address": address,
+                "values": None if values is None else [int(value) for value in values],
+                "next": None if position is None else export.token(*position)
+            }
+            if values is None:
+                record["error"] = result["error"]
+            pending.append(json.dumps(record, separators=(',', ':')) + '\n')
+        else:
+            pending.append(_csv_rows(table, export.unit_id, address, count, values))
+        exported += count
+
+        if block_number % export_config.FLUSH_BLOCKS == 0:
+            if not ndjson:
+                # Ponto de retomada a cada envio: um cliente que cai no meio do download
+                # retoma a partir da última linha "# next=" recebida
+                position = export.position_after(table_index, address, count)
+                if position is not None:
+                    pending.append(f"# next={export.token(*position)}\n")
+            yield ''.join(pending)
+            pending.clear()
+
+    if ndjson:
+        pending.append(json.dumps({"complete": True, "next": None}, separators=(',', ':')) + '\n')
+    logger.info(f"📦 Exportação concluída: {exported} endereços")
+    yield ''.join(pending)
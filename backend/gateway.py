@@ -0,0 +1,407 @@
+# backend/gateway.py
+# Conexão compartilhada com gateways Modbus TCP/RTU atendendo várias unidades
+
+import logging
+import socket
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Optional, Sequence, Tuple, TypeVar
+from config import gateway_config
+from backend.modbus_codec import (
+    ModbusCodec,
+    ModbusCodecError,
+    ModbusExceptionResponse,
+    MBAP_HEADER,
+    MBAP_SIZE,
+    MAX_ADU_SIZE,
+    FC_WRITE_MULTIPLE_COILS,
+    FC_WRITE_MULTIPLE_REGISTERS,
+    FC_WRITE_SINGLE_COIL,
+    FC_WRITE_SINGLE_REGISTER,
+    COIL_ON,
+    COIL_OFF,
+)
+from backend.profiler import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class GatewayUnitError(ModbusCodecError):
+    """Falha isolada de uma unidade atrás do gateway (não derruba a conexão)"""
+
+    def __init__(self, unit_id: int, message: str):
+        self.unit_id = unit_id
+        super().__init__(f"Unidade {unit_id}: {message}")
+
+
+class _PendingRequest:
+    """Requisição enviada aguardando a resposta com o mesmo ID de transação"""
+    __slots__ = ('event', 'response', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response: Optional[bytes] = None
+        self.error: Optional[Exception] = None
+
+
+class UnitState:
+    """Agendamento, timeout e isolamento de falhas de uma unidade"""
+
+    def __init__(self, unit_id: int, timeout: float, max_in_flight: int):
+        self.unit_id = unit_id
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.consecutive_failures = 0
+        self.suspended_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.last_latency: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "unit_id": self.unit_id,
+            "timeout": self.timeout,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "suspended": self.suspended_until > time.monotonic(),
+            "last_latency_ms": None if self.last_latency is None else round(self.last_latency * 1000, 3)
+        }
+
+
+class GatewayConnection:
+    """
+    Uma única conexão TCP com o gateway, compartilhada por todas as unidades
+
+    As requisições são enviadas em pipeline e as respostas são distribuídas
+    por ID de transação por uma thread leitora. Cada unidade tem sua própria
+    fila (limite de requisições simultâneas), seu timeout e seu contador de
+    falhas: uma unidade serial lenta ou ausente expira sozinha e é suspensa
+    temporariamente, sem bloquear as demais nem derrubar a conexão.
+    """
+
+    def __init__(self, ip: str, port: int, timeout: float,
+                 unit_timeouts: Dict[int, float] = None):
+        """
+        Prepara a conexão com o gateway
+
+        Args:
+            ip: Endereço IP do gateway
+            port: Porta TCP do gateway
+            timeout: Timeout padrão por requisição e de conexão, em segundos
+            unit_timeouts: Timeouts específicos por unit id
+        """
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.socket: Optional[socket.socket] = None
+        self._unit_timeouts = dict(unit_timeouts or {})
+        self._units: Dict[int, UnitState] = {}
+        self._units_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, _PendingRequest] = {}
+        self._pending_lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(gateway_config.MAX_IN_FLIGHT)
+        self._codec = ModbusCodec()
+        self._reader: Optional[threading.Thread] = None
+        self._generation = 0
+        self._connect_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Conexão
+    # ------------------------------------------------------------------
+
+    @property
+    def connected(self) -> bool:
+        return self.socket is not None
+
+    def connect(self) -> bool:
+        """Abre (ou reabre) a conexão e inicia a thread leitora"""
+        with self._connect_lock:
+            return self._open()
+
+    def ensure_connected(self) -> bool:
+        """
+        Reconecta apenas se a conexão foi perdida
+
+        Várias threads que detectam a mesma queda fazem uma única reconexão;
+        uma conexão ativa nunca é derrubada por falha de uma unidade.
+        """
+        with self._connect_lock:
+            if self.socket is not None:
+                return True
+            return self._open()
+
+    def _open(self) -> bool:
+        self.close()
+        try:
+            sock = socket.create_connection((self.ip, self.port), timeout=self.timeout)
+        except OSError as e:
+            logger.error(f"❌ Falha na conexão com o gateway {self.ip}:{self.port}: {e}")
+            return False
+
+        # A thread leitora bloqueia até chegar dado; os timeouts são por requisição
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket = sock
+        self._generation += 1
+        self._reader = threading.Thread(target=self._read_loop, args=(self._generation,), daemon=True)
+        self._reader.start()
+        logger.info(f"✅ Conectado ao gateway {self.ip}:{self.port}")
+        return True
+
+    def close(self) -> None:
+        """Fecha a conexão e falha todas as requisições pendentes"""
+        with self._pending_lock:
+            sock, self.socket = self.socket, None
+            self._generation += 1
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self._fail_all(ModbusCodecError("Conexão com o gateway encerrada"))
+
+    def _fail_all(self, error: Exception) -> None:
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for request in pending.values():
+            request.error = error
+            request.event.set()
+
+    def _read_loop(self, generation: int) -> None:
+        """Lê respostas e as entrega às requisições pelo ID de transação"""
+        buffer = bytearray(MAX_ADU_SIZE)
+        view = memoryview(buffer)
+
+        def recv_exact(sock: socket.socket, offset: int, size: int) -> None:
+            end = offset + size
+            while offset < end:
+                received = sock.recv_into(view[offset:end])
+                if not received:
+                    raise ModbusCodecError("Conexão fechada pelo gateway")
+                offset += received
+
+        try:
+            while True:
+                # O socket pode ser envolvido depois (ex.: captura de tráfego);
+                # a troca só é aplicada entre uma ADU e outra
+                sock = self.socket
+                if sock is None or generation != self._generation:
+                    return
+                recv_exact(sock, 0, MBAP_SIZE)
+                transaction_id, _, length, _ = MBAP_HEADER.unpack_from(buffer)
+                if length < 2 or length > MAX_ADU_SIZE - 6:
+                    raise ModbusCodecError(f"Comprimento MBAP inválido: {length}")
+                recv_exact(sock, MBAP_SIZE, length - 1)
+
+                # Socket envolvido (captura) enquanto esta ADU era lida do original
+                current = self.socket
+                if current is not sock and getattr(current, 'raw', None) is sock:
+                    current.observe_received(view[:6 + length])
+
+                with self._pending_lock:
+                    request = self._pending.pop(transaction_id, None)
+                if request is None:
+                    # Resposta tardia de uma requisição que já expirou
+                    logger.debug(f"Resposta descartada para a transação {transaction_id}")
+                    continue
+                request.response = bytes(view[:6 + length])
+                request.event.set()
+        except (OSError, ModbusCodecError) as e:
+            self._connection_lost(generation, e)
+
+    def _connection_lost(self, generation: int, error: Exception) -> None:
+        """Marca a conexão como perdida (uma vez por geração) e falha as pendentes"""
+        with self._pending_lock:
+            if generation != self._generation:
+                return
+            self._generation += 1
+            sock, self.socket = self.socket, None
+        logger.error(f"❌ Conexão com o gateway perdida: {error}")
+        if sock is not None:
+            sock.close()
+        self._fail_all(ModbusCodecError(f"Conexão com o gateway perdida: {error}"))
+
+    # ------------------------------------------------------------------
+    # Unidades
+    # ------------------------------------------------------------------
+
+    def unit(self, unit_id: int) -> UnitState:
+        """Retorna (criando se necessário) o estado da unidade"""
+        state = self._units.get(unit_id)
+        if state is None:
+            with self._units_lock:
+                state = self._units.get(unit_id)
+                if state is None:
+                    state = UnitState(
+                        unit_id,
+                        self._unit_timeouts.get(unit_id, self.timeout),
+                        gateway_config.MAX_IN_FLIGHT_PER_UNIT
+                    )
+                    self._units[unit_id] = state
+        return state
+
+    def set_unit_timeout(self, unit_id: int, timeout: float) -> None:
+        self._unit_timeouts[unit_id] = timeout
+        self.unit(unit_id).timeout = timeout
+
+    def units(self) -> Dict[int, Dict[str, object]]:
+        with self._units_lock:
+            return {unit_id: state.to_dict() for unit_id, state in sorted(self._units.items())}
+
+    def _record_failure(self, state: UnitState) -> None:
+        state.failures += 1
+        state.consecutive_failures += 1
+        if state.consecutive_failures >= gateway_config.UNIT_FAILURE_THRESHOLD:
+            state.suspended_until = time.monotonic() + gateway_config.UNIT_COOLDOWN
+            logger.warning(
+                f"⏸️ Unidade {state.unit_id} suspensa por {gateway_config.UNIT_COOLDOWN}s "
+                f"após {state.consecutive_failures} falhas consecutivas"
+            )
+
+    # ------------------------------------------------------------------
+    # Transações
+    # ------------------------------------------------------------------
+
+    def request(self, unit_id: int, build: Callable[[ModbusCodec], memoryview],
+                parse: Callable[[memoryview, int], T]) -> T:
+        """
+        Executa uma transação para a unidade, respeitando sua fila e seu timeout
+
+        Args:
+            unit_id: Unidade de destino
+            build: Monta a ADU no codec compartilhado (chamado sob o lock de envio)
+            parse: Interpreta a ADU de resposta dado o ID de transação
+
+        Raises:
+            GatewayUnitError: Timeout, fila cheia, unidade suspensa ou resposta inválida
+            ModbusExceptionResponse: Resposta de exceção da unidade
+            ModbusCodecError: Falha da conexão com o gateway
+        """
+        state = self.unit(unit_id)
+        if state.suspended_until > time.monotonic():
+            raise GatewayUnitError(unit_id, "suspensa após falhas consecutivas")
+
+        deadline = time.monotonic() + state.timeout
+        if not state.slots.acquire(timeout=state.timeout):
+            self._record_failure(state)
+            raise GatewayUnitError(unit_id, "fila da unidade esgotou o timeout")
+
+        try:
+            if not self._in_flight.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise GatewayUnitError(unit_id, "gateway sem capacidade dentro do timeout")
+
+            try:
+                return self._transact(state, deadline, build, parse)
+            finally:
+                self._in_flight.release()
+        finally:
+            state.slots.release()
+
+    def _transact(self, state: UnitState, deadline: float,
+                  build: Callable[[ModbusCodec], memoryview],
+                  parse: Callable[[memoryview, int], T]) -> T:
+        pending = _PendingRequest()
+        started = time.monotonic()
+
+        with self._send_lock:
+            sock = self.socket
+            if sock is None:
+                raise ModbusCodecError("Gateway não conectado")
+            generation = self._generation
+            adu = build(self._codec)
+            transaction_id = self._codec.transaction_id
+            with self._pending_lock:
+                self._pending[transaction_id] = pending
+            try:
+                with span('socket.send'):
+                    sock.sendall(adu)
+            except OSError as e:
+                self._connection_lost(generation, e)
+                raise ModbusCodecError(f"Falha no envio ao gateway: {e}")
+
+        state.requests += 1
+        with span('gateway.wait'):
+            answered = pending.event.wait(max(0.0, deadline - time.monotonic()))
+
+        if not answered:
+            with self._pending_lock:
+                self._pending.pop(transaction_id, None)
+            self._record_failure(state)
+            raise GatewayUnitError(state.unit_id, f"sem resposta em {state.timeout}s")
+
+        if pending.error is not None:
+            raise pending.error
+
+        state.last_latency = time.monotonic() - started
+        try:
+            result = parse(memoryview(pending.response), transaction_id)
+        except ModbusExceptionResponse:
+            state.consecutive_failures = 0
+            raise
+        except ModbusCodecError as e:
+            # Resposta malformada de uma unidade: o enquadramento MBAP está
+            # íntegro, então a falha fica restrita a ela
+            self._record_failure(state)
+            raise GatewayUnitError(state.unit_id, str(e))
+
+        state.consecutive_failures = 0
+        return result
+
+    # ------------------------------------------------------------------
+    # Operações
+    # ------------------------------------------------------------------
+
+    def read_registers(self, function_code: int, unit_id: int, address: int, count: int) -> array:
+        """Lê registradores (FC03/FC04) da unidade"""
+        return self.request(
+            unit_id,
+            lambda codec: codec.build_read_request(function_code, unit_id, address, count),
+            lambda adu, tid: self._codec.parse_registers(adu, unit_id, function_code, count, tid)
+        )
+
+    def read_bits(self, function_code: int, unit_id: int, address: int, count: int) -> array:
+        """Lê bobinas ou entradas discretas (FC01/FC02) da unidade"""
+        return self.request(
+            unit_id,
+            lambda codec: codec.build_read_request(function_code, unit_id, address, count),
+            lambda adu, tid: self._codec.parse_bits(adu, unit_id, function_code, count, tid)
+        )
+
+    def write_register(self, unit_id: int, address: int, value: int) -> Tuple[int, int]:
+        """Escreve um registrador (FC06) na unidade"""
+        return self.request(
+            unit_id,
+            lambda codec: codec.build_write_single_request(FC_WRITE_SINGLE_REGISTER, unit_id, address, value),
+            lambda adu, tid: self._codec.parse_write_response(adu, unit_id, FC_WRITE_SINGLE_REGISTER, tid)
+        )
+
+    def write_coil(self, unit_id: int, address: int, value: int) -> Tuple[int, int]:
+        """Escreve uma bobina (FC05) na unidade"""
+        encoded = COIL_ON if value else COIL_OFF
+        return self.request(
+            unit_id,
+            lambda codec: codec.build_write_single_request(FC_WRITE_SINGLE_COIL, unit_id, address, encoded),
+            lambda adu, tid: self._codec.parse_write_response(adu, unit_id, FC_WRITE_SINGLE_COIL, tid)
+        )
+
+    def write_registers(self, unit_id: int, address: int, values: Sequence[int]) -> Tuple[int, int]:
+        """Escreve múltiplos registradores (FC16) na unidade"""
+        return self.request(
+            unit_id,
+            lambda codec: codec.build_write_registers_request(unit_id, address, values),
+            lambda adu, tid: self._codec.parse_write_response(adu, unit_id, FC_WRITE_MULTIPLE_REGISTERS, tid)
+        )
+
+    def write_coils(self, unit_id: int, address: int, bits: Sequence[int]) -> Tuple[int, int]:
+        """Escreve múltiplas bobinas (FC15) na unidade"""
+        return self.request(
+            unit_id,
+            lambda codec: codec.build_write_coils_request(unit_id, address, bits),
+            lambda adu, tid: self._codec.parse_write_response(adu, unit_id, FC_WRITE_MULTIPLE_COILS, tid)
+        )
@@ -0,0 +1,368 @@
+# backend/modbus_codec.py
+# Codec enxuto MBAP/PDU para leituras e escritas Modbus TCP de alta taxa
+
+import socket
+import struct
+import sys
+from array import array
+from typing import Sequence, Tuple
+from backend.profiler import span
+
+# Códigos de função suportados pelo caminho rápido
+FC_READ_COILS = 0x01
+FC_READ_DISCRETE_INPUTS = 0x02
+FC_READ_HOLDING_REGISTERS = 0x03
+FC_READ_INPUT_REGISTERS = 0x04
+FC_WRITE_SINGLE_COIL = 0x05
+FC_WRITE_SINGLE_REGISTER = 0x06
+FC_WRITE_MULTIPLE_COILS = 0x0F
+FC_WRITE_MULTIPLE_REGISTERS = 0x10
+
+READ_BIT_FUNCTIONS = (FC_READ_COILS, FC_READ_DISCRETE_INPUTS)
+READ_REGISTER_FUNCTIONS = (FC_READ_HOLDING_REGISTERS, FC_READ_INPUT_REGISTERS)
+
+# Cabeçalho MBAP: transação, protocolo, comprimento, unidade
+MBAP_HEADER = struct.Struct('>HHHB')
+MBAP_SIZE = MBAP_HEADER.size
+
+# ADU completa de leitura (FC01-FC04): MBAP + função + endereço + quantidade
+READ_REQUEST = struct.Struct('>HHHBBHH')
+
+# ADU de escrita simples (FC05/FC06) tem o mesmo formato: MBAP + função + endereço + valor
+WRITE_SINGLE_REQUEST = READ_REQUEST
+
+# Valores de bobina na escrita simples (FC05)
+COIL_ON = 0xFF00
+COIL_OFF = 0x0000
+
+# Cabeçalho de escrita múltipla (FC15/FC16): MBAP + função + endereço + quantidade + bytes
+WRITE_MULTIPLE_HEADER = struct.Struct('>HHHBBHHB')
+
+# Eco da resposta de escrita: endereço + quantidade (FC15/FC16) ou valor (FC05/FC06)
+WRITE_ECHO = struct.Struct('>HH')
+
+# Maior ADU Modbus TCP possível (MBAP de 7 bytes + PDU de até 253 bytes)
+MAX_ADU_SIZE = 260
+
+_BIG_ENDIAN_HOST = sys.byteorder == 'big'
+
+# Tabela de expansão byte -> 8 bits (LSB primeiro, como no protocolo)
+_BIT_TABLE = tuple(bytes((byte >> bit) & 1 for bit in range(8)) for byte in range(256))
+
+
+class ModbusCodecError(Exception):
+    """Erro de enquadramento ou de transporte no codec enxuto"""
+
+
+class ModbusExceptionResponse(ModbusCodecError):
+    """Resposta de exceção Modbus devolvida pelo dispositivo"""
+
+    def __init__(self, function_code: int, exception_code: int):
+        self.function_code = function_code
+        self.exception_code = exception_code
+        super().__init__(
+            f"Exceção Modbus {exception_code} na função {function_code}"
+        )
+
+
+def pack_bits(bits: Sequence[int]) -> bytes:
+    """
+    Empacota uma sequência de bits (0/1) em bytes, LSB primeiro
+
+    Args:
+        bits: Valores dos bits na ordem dos endereços
+
+    Returns:
+        bytes: Bits empacotados conforme o protocolo Modbus
+    """
+    packed = bytearray((len(bits) + 7) // 8)
+    for index, bit in enumerate(bits):
+        if bit:
+            packed[index >> 3] |= 1 << (index & 7)
+    return bytes(packed)
+
+
+def unpack_bits(data: memoryview, count: int) -> array:
+    """
+    Expande bytes de bits empacotados em um array('B') de 0/1
+
+    Args:
+        data: Bytes de dados da resposta (sem cabeçalho)
+        count: Quantidade de bits solicitada
+
+    Returns:
+        array: array('B') com exatamente `count` bits
+    """
+    bits = array('B', b''.join([_BIT_TABLE[byte] for byte in data]))
+    del bits[count:]
+    return bits
+
+
+class ModbusCodec:
+    """
+    Codec MBAP/PDU sem alocações intermediárias para FC01-FC06, FC15 e FC16
+
+    As requisições são montadas em um buffer pré-alocado e as respostas são
+    lidas com recv_into em outro buffer, sendo interpretadas via memoryview.
+    Registradores são entregues como array('H') e bits como array('B').
+    """
+
+    def __init__(self, timeout: float = None):
+        """
+        Inicializa o codec
+
+        Args:
+            timeout: Timeout de recepção em segundos (None mantém o do socket)
+        """
+        self.timeout = timeout
+        self._transaction_id = 0
+        self._request = bytearray(MAX_ADU_SIZE)
+        self._request_view = memoryview(self._request)
+        self._response = bytearray(MAX_ADU_SIZE)
+        self._response_view = memoryview(self._response)
+
+    @property
+    def transaction_id(self) -> int:
+        """ID de transação da última requisição montada"""
+        return self._transaction_id
+
+    def _next_transaction_id(self) -> int:
+        self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+        return self._transaction_id
+
+    # ------------------------------------------------------------------
+    # Montagem de requisições
+    # ------------------------------------------------------------------
+
+    def build_read_request(self, function_code: int, unit_id: int,
+                           address: int, count: int) -> memoryview:
+        """
+        Monta uma requisição de leitura (FC01-FC04) no buffer interno
+
+        Returns:
+            memoryview: Fatia do buffer contendo a ADU pronta para envio
+        """
+        READ_REQUEST.pack_into(
+            self._request, 0,
+            self._next_transaction_id(), 0, 6, unit_id,
+            function_code, address, count
+        )
+        return self._request_view[:READ_REQUEST.size]
+
+    def build_write_single_request(self, function_code: int, unit_id: int,
+                                   address: int, value: int) -> memoryview:
+        """
+        Monta uma requisição de escrita simples (FC05 ou FC06)
+
+        Para FC05 o valor já deve estar codificado (COIL_ON ou COIL_OFF).
+
+        Returns:
+            memoryview: Fatia do buffer contendo a ADU pronta para envio
+        """
+        WRITE_SINGLE_REQUEST.pack_into(
+            self._request, 0,
+            self._next_transaction_id(), 0, 6, unit_id,
+            function_code, address, value
+        )
+        return self._request_view[:WRITE_SINGLE_REQUEST.size]
+
+    def build_write_registers_request(self, unit_id: int, address: int,
+                                      values: Sequence[int]) -> memoryview:
+        """
+        Monta uma requisição FC16 (escrita de múltiplos registradores)
+
+        Returns:
+            memoryview: Fatia do buffer contendo a ADU pronta para envio
+        """
+        count = len(values)
+        byte_count = count * 2
+        WRITE_MULTIPLE_HEADER.pack_into(
+            self._request, 0,
+            self._next_transaction_id(), 0, 7 + byte_count, unit_id,
+            FC_WRITE_MULTIPLE_REGISTERS, address, count, byte_count
+        )
+        struct.pack_into(f'>{count}H', self._request, WRITE_MULTIPLE_HEADER.size, *values)
+        return self._request_view[:WRITE_MULTIPLE_HEADER.size + byte_count]
+
+    def build_write_coils_request(self, unit_id: int, address: int,
+                                  bits: Sequence[int]) -> memoryview:
+        """
+        Monta uma requisição FC15 (escrita de múltiplas bobinas)
+
+        Returns:
+            memoryview: Fatia do buffer contendo a ADU pronta para envio
+        """
+        packed = pack_bits(bits)
+        byte_count = len(packed)
+        WRITE_MULTIPLE_HEADER.pack_into(
+            self._request, 0,
+            self._next_transaction_id(), 0, 7 + byte_count, unit_id,
+            FC_WRITE_MULTIPLE_COILS, address, len(bits), byte_count
+        )
+        start = WRITE_MULTIPLE_HEADER.size
+        self._request[start:start + byte_count] = packed
+        return self._request_view[:start + byte_count]
+
+    # ------------------------------------------------------------------
+    # Interpretação de respostas
+    # ------------------------------------------------------------------
+
+    def _check_header(self, adu: memoryview, unit_id: int, function_code: int,
+                      expected_transaction_id: int = None) -> memoryview:
+        """Valida o MBAP e a função, retornando o PDU após o código de função"""
+        if len(adu) < MBAP_SIZE + 2:
+            raise ModbusCodecError("Resposta curta demais")
+
+        if expected_transaction_id is None:
+            expected_transaction_id = self._transaction_id
+
+        transaction_id, protocol_id, length, unit = MBAP_HEADER.unpack_from(adu)
+        if transaction_id != expected_transaction_id:
+            raise ModbusCodecError(
+                f"ID de transação inesperado: {transaction_id} (esperado {expected_transaction_id})"
+            )
+        if protocol_id != 0:
+            raise ModbusCodecError(f"ID de protocolo inválido: {protocol_id}")
+        if length != len(adu) - 6:
+            raise ModbusCodecError("Comprimento MBAP inconsistente")
+        if unit != unit_id:
+            raise ModbusCodecError(f"Unit ID inesperado: {unit} (esperado {unit_id})")
+
+        function = adu[MBAP_SIZE]
+        if function == function_code | 0x80:
+            raise ModbusExceptionResponse(function_code, adu[MBAP_SIZE + 1])
+        if function != function_code:
+            raise ModbusCodecError(f"Função inesperada na resposta: {function}")
+
+        return adu[MBAP_SIZE + 1:]
+
+    def parse_registers(self, adu: memoryview, unit_id: int, function_code: int,
+                        count: int, transaction_id: int = None) -> array:
+        """
+        Interpreta a resposta de FC03/FC04
+
+        Returns:
+            array: array('H') com os valores dos registradores
+        """
+        pdu = self._check_header(adu, unit_id, function_code, transaction_id)
+        byte_count = pdu[0]
+        if byte_count != count * 2 or len(pdu) < 1 + byte_count:
+            raise ModbusCodecError("Contagem de bytes inválida na resposta")
+
+        registers = array('H')
+        registers.frombytes(pdu[1:1 + byte_count])
+        if not _BIG_ENDIAN_HOST:
+            registers.byteswap()
+        return registers
+
+    def parse_bits(self, adu: memoryview, unit_id: int, function_code: int,
+                   count: int, transaction_id: int = None) -> array:
+        """
+        Interpreta a resposta de FC01/FC02
+
+        Returns:
+            array: array('B') com 0/1 para cada bit solicitado
+        """
+        pdu = self._check_header(adu, unit_id, function_code, transaction_id)
+        byte_count = pdu[0]
+        if byte_count != (count + 7) // 8 or len(pdu) < 1 + byte_count:
+            raise ModbusCodecError("Contagem de bytes inválida na resposta")
+        return unpack_bits(pdu[1:1 + byte_count], count)
+
+    def parse_write_response(self, adu: memoryview, unit_id: int, function_code: int,
+                             transaction_id: int = None) -> Tuple[int, int]:
+        """
+        Interpreta a resposta de FC05/FC06/FC15/FC16
+
+        Returns:
+            tuple: (endereço, quantidade ou valor) ecoados pelo dispositivo
+        """
+        pdu = self._check_header(adu, unit_id, function_code, transaction_id)
+        if len(pdu) < WRITE_ECHO.size:
+            raise ModbusCodecError("Resposta de escrita incompleta")
+        return WRITE_ECHO.unpack_from(pdu)
+
+    # ------------------------------------------------------------------
+    # Transporte
+    # ------------------------------------------------------------------
+
+    def _recv_exact(self, sock: socket.socket, offset: int, size: int) -> None:
+        view = self._response_view
+        end = offset + size
+        while offset < end:
+            received = sock.recv_into(view[offset:end])
+            if not received:
+                raise ModbusCodecError("Conexão fechada pelo dispositivo")
+            offset += received
+
+    def exchange(self, sock: socket.socket, request: memoryview) -> memoryview:
+        """
+        Envia uma ADU e recebe a resposta completa no buffer interno
+
+        A memoryview retornada aponta para o buffer reutilizável do codec e só
+        é válida até a próxima chamada. Respostas atrasadas de transações
+        anteriores são descartadas. O codec não é thread-safe: quem compartilha
+        a instância deve serializar montagem, troca e interpretação.
+
+        Returns:
+            memoryview: ADU de resposta
+        """
+        if sock is None:
+            raise ModbusCodecError("Socket não conectado")
+
+        # O cliente pymodbus deixa o socket em modo não bloqueante
+        sock.settimeout(self.timeout)
+        with span('socket.send'):
+            sock.sendall(request)
+
+        expected = self._transaction_id
+        with span('socket.recv'):
+            while True:
+                self._recv_exact(sock, 0, MBAP_SIZE)
+                transaction_id, _, length, _ = MBAP_HEADER.unpack_from(self._response)
+                if length < 2 or length > MAX_ADU_SIZE - 6:
+                    raise ModbusCodecError(f"Comprimento MBAP inválido: {length}")
+                self._recv_exact(sock, MBAP_SIZE, length - 1)
+
+                # Resposta atrasada de uma requisição anterior que expirou: descarta
+                if 0 < (expected - transaction_id) & 0xFFFF < 0x8000:
+                    continue
+                return self._response_view[:6 + length]
+
+    # ------------------------------------------------------------------
+    # Operações completas
+    # ------------------------------------------------------------------
+
+    def read_registers(self, sock: socket.socket, function_code: int,
+                       unit_id: int, address: int, count: int) -> array:
+        """Lê registradores (FC03/FC04) e retorna array('H')"""
+        request = self.build_read_request(function_code, unit_id, address, count)
+        return self.parse_registers(self.exchange(sock, request), unit_id, function_code, count)
+
+    def read_bits(self, sock: socket.socket, function_code: int,
+                  unit_id: int, address: int, count: int) -> array:
+        """Lê bobinas ou entradas discretas (FC01/FC02) e retorna array('B')"""
+        request = self.build_read_request(function_code, unit_id, address, count)
+        return self.parse_bits(self.exchange(sock, request), unit_id, function_code, count)
+
+    def write_single(self, sock: socket.socket, function_code: int, unit_id: int,
+                     address: int, value: int) -> Tuple[int, int]:
+        """Escreve uma bobina ou um registrador (FC05/FC06)"""
+        request = self.build_write_single_request(function_code, unit_id, address, value)
+        return self.parse_write_response(self.exchange(sock, request), unit_id, function_code)
+
+    def write_registers(self, sock: socket.socket, unit_id: int,
+                        address: int, values: Sequence[int]) -> Tuple[int, int]:
+        """Escreve múltiplos registradores (FC16)"""
+        request = self.build_write_registers_request(unit_id, address, values)
+        return self.parse_write_response(
+            self.exchange(sock, request), unit_id, FC_WRITE_MULTIPLE_REGISTERS
+        )
+
+    def write_coils(self, sock: socket.socket, unit_id: int,
+                    address: int, bits: Sequence[int]) -> Tuple[int, int]:
+        """Escreve múltiplas bobinas (FC15)"""
+        request = self.build_write_coils_request(unit_id, address, bits)
+        return self.parse_write_response(
+            self.exchange(sock, request), unit_id, FC_WRITE_MULTIPLE_COILS
+        )
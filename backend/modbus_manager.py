@@ -2,33 +2,86 @@
 # Gerenciador de conexões e operações Modbus
 
 from pymodbus.client import ModbusTcpClient
+from pymodbus.pdu import ExceptionResponse
 import logging
+import threading
 import time
-from typing import Dict, List, Optional, Union
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 from config import modbus_config
+from backend.modbus_codec import (
+    ModbusCodec,
+    ModbusExceptionResponse,
+    FC_READ_COILS,
+    FC_READ_HOLDING_REGISTERS,
+)
+from backend.gateway import GatewayConnection, GatewayUnitError
+from backend.traffic_capture import CapturingSocket, TrafficRecorder
+from backend.profiler import profiled, span
 
 logger = logging.getLogger(__name__)
 
 
+class _InstrumentedTcpClient(ModbusTcpClient):
+    """Cliente pymodbus com as etapas de envio e recepção medidas pelo perfilador"""
+    
+    def send(self, request):
+        with span('socket.send'):
+            return super().send(request)
+    
+    def recv(self, size):
+        with span('socket.recv'):
+            return super().recv(size)
+
+
 class ModbusManager:
     """Classe para gerenciar conexões e operações Modbus de forma robusta"""
     
-    def __init__(self, ip: str, port: int = None, unit_id: int = None, timeout: int = None):
+    def __init__(self, ip: str, port: int = None, unit_id: int = None, timeout: int = None,
+                 fast_codec: bool = None, gateway: bool = None, unit_timeouts: Dict[int, float] = None,
+                 max_retries: int = None):
         """
         Inicializa o gerenciador Modbus
         
         Args:
             ip: Endereço IP do dispositivo Modbus
             port: Porta TCP (padrão: 502)
-            unit_id: ID da unidade Modbus (padrão: 1)
+            unit_id: ID da unidade Modbus padrão das operações (padrão: 1)
             timeout: Timeout de conexão em segundos (padrão: 10)
+            fast_codec: Usa o codec enxuto nas leituras (padrão: modbus_config.FAST_CODEC)
+            gateway: Compartilha uma conexão em pipeline entre várias unidades
+                (padrão: modbus_config.GATEWAY_MODE)
+            unit_timeouts: Timeouts específicos por unit id no modo gateway
+            max_retries: Tentativas de reconexão por operação (padrão: 3)
         """
         self.ip = ip
         self.port = port or modbus_config.DEFAULT_PORT
         self.unit_id = unit_id or modbus_config.DEFAULT_UNIT_ID
         self.timeout = timeout or modbus_config.DEFAULT_TIMEOUT
+        self.max_retries = modbus_config.MAX_RETRIES if max_retries is None else max_retries
         self.client: Optional[ModbusTcpClient] = None
         self.is_connected = False
+        # True quando a última tentativa de (re)conexão falhou: perda confirmada do dispositivo,
+        # ao contrário de um socket fechado localmente após timeout
+        self.connect_failed = False
+        # Serializa o uso do socket: o codec enxuto não passa pelo lock de transação do pymodbus
+        self._io_lock = threading.RLock()
+        
+        if fast_codec is None:
+            fast_codec = modbus_config.FAST_CODEC
+        self.codec: Optional[ModbusCodec] = ModbusCodec(timeout=self.timeout) if fast_codec else None
+        
+        if gateway is None:
+            gateway = modbus_config.GATEWAY_MODE
+        self.gateway: Optional[GatewayConnection] = (
+            GatewayConnection(self.ip, self.port, self.timeout, unit_timeouts) if gateway else None
+        )
+        
+        # Ouvinte opcional das amostras lidas (ex.: motor de alarmes)
+        self.sample_listener: Optional[Callable[[str, int, Sequence[Any], int], None]] = None
+        
+        # Gravador opcional do tráfego (requisições, respostas e latências)
+        self.recorder: Optional[TrafficRecorder] = None
     
     def connect(self) -> bool:
         """
@@ -38,40 +91,114 @@ class ModbusManager:
             bool: True se conectado com sucesso, False caso contrário
         """
         try:
-            # Fechar conexão anterior se existir
-            if self.client and self.client.connected:
-                self.client.close()
-                logger.info("Conexão anterior fechada")
-            
-            # Criar novo cliente
-            self.client = ModbusTcpClient(
-                host=self.ip, 
-                port=self.port, 
-                timeout=self.timeout
-            )
+            # Modo gateway: uma única conexão compartilhada por todas as unidades
+            if self.gateway is not None:
+                self.is_connected = self.gateway.ensure_connected()
+                self.connect_failed = not self.is_connected
+                if self.is_connected:
+                    self._attach_recorder()
+                return self.is_connected
+            
+            with self._io_lock:
+                # Fechar conexão anterior se existir
+                if self.client and self.client.connected:
+                    self.client.close()
+                    logger.info("Conexão anterior fechada")
+                
+                # Criar novo cliente
+                self.client = _InstrumentedTcpClient(
+                    host=self.ip, 
+                    port=self.port, 
+                    timeout=self.timeout
+                )
+                connected = self.client.connect()
             
             # Tentar conectar
-            if self.client.connect():
+            if connected:
                 self.is_connected = True
+                self.connect_failed = False
+                self._attach_recorder()
                 logger.info(f"✅ Conectado ao dispositivo Modbus em {self.ip}:{self.port}")
                 return True
             else:
                 self.is_connected = False
+                self.connect_failed = True
                 logger.error(f"❌ Falha na conexão com {self.ip}:{self.port}")
                 return False
                 
         except Exception as e:
             self.is_connected = False
+            self.connect_failed = True
             logger.error(f"❌ Exceção na conexão: {e}")
             return False
     
     def disconnect(self) -> None:
         """Fecha a conexão com o dispositivo Modbus"""
-        if self.client:
+        if self.gateway is not None:
+            self.gateway.close()
+            self.is_connected = False
+            logger.info("🔌 Desconectado do gateway Modbus")
+        elif self.client:
             self.client.close()
             self.is_connected = False
             logger.info("🔌 Desconectado do dispositivo Modbus")
     
+    def set_recorder(self, recorder: Optional[TrafficRecorder]) -> None:
+        """
+        Ativa (ou desativa, com None) a gravação do tráfego da conexão
+        
+        Args:
+            recorder: Gravador de tráfego ou None para parar de gravar
+        """
+        self.recorder = recorder
+        self._attach_recorder()
+    
+    def _attach_recorder(self) -> None:
+        """Envolve (ou libera) o socket atual conforme o gravador configurado"""
+        transport = self.gateway if self.gateway is not None else self.client
+        if not transport or not transport.socket:
+            return
+        
+        sock = transport.socket
+        if isinstance(sock, CapturingSocket):
+            sock = sock.raw
+        
+        if self.recorder:
+            sock = CapturingSocket(sock, self.recorder, pipelined=self.gateway is not None)
+        transport.socket = sock
+    
+    def _notify_sample(self, table: str, start_address: int, values: Sequence[Any], unit_id: int) -> None:
+        """Entrega uma leitura bem-sucedida ao ouvinte de amostras, se houver"""
+        if self.sample_listener is None:
+            return
+        try:
+            self.sample_listener(table, start_address, values, unit_id)
+        except Exception as e:
+            logger.error(f"❌ Erro no ouvinte de amostras: {e}")
+    
+    def connection_alive(self) -> bool:
+        """Indica se o transporte (cliente ou gateway) continua conectado"""
+        transport = self.gateway if self.gateway is not None else self.client
+        return bool(transport and transport.connected)
+    
+    def _reset_stream(self) -> None:
+        """
+        Fecha o socket após timeout ou erro de enquadramento na conexão direta
+
+        O fluxo pode ter ficado no meio de uma ADU; a próxima operação
+        reconecta (via _ensure_connection) mesmo sem tentativas de retry.
+        """
+        if self.gateway is not None or not self.client:
+            return
+        with self._io_lock:
+            self.client.close()
+        self.is_connected = False
+
+    def _retry_sleep(self) -> None:
+        """Aguarda antes de uma nova tentativa"""
+        with span('modbus.retry_sleep'):
+            time.sleep(1)
+    
     def _ensure_connection(self) -> bool:
         """
         Verifica e garante que a conexão está ativa
@@ -79,25 +206,38 @@ class ModbusManager:
         Returns:
             bool: True se a conexão está ativa, False caso contrário
         """
-        if not self.client or not self.client.connected:
+        if not self.connection_alive():
             logger.warning("🔄 Conexão perdida, tentando reconectar...")
             return self.connect()
         return True
     
-    def read_holding_registers(self, start_address: int, count: int, retries: int = 0) -> Dict[str, Union[bool, List[int], str, None]]:
+    @profiled('modbus.read_holding_registers')
+    def read_holding_registers(self, start_address: int, count: int, unit_id: int = None, retries: int = 0,
+                               notify: bool = True) -> Dict[str, Union[bool, List[int], array, str, None]]:
         """
         Lê registradores holding do dispositivo Modbus
         
         Args:
             start_address: Endereço inicial dos registradores
             count: Quantidade de registradores a ler
+            unit_id: ID da unidade de destino (padrão: unit_id do gerenciador)
             retries: Número de tentativas de retry (uso interno)
+            notify: Entrega a leitura ao ouvinte de amostras (False em leituras em massa)
         
         Returns:
-            dict: {"success": bool, "data": List[int] | None, "error": str | None}
+            dict: {"success": bool, "data": List[int] | array('H') | None, "error": str | None}
         """
+        unit_id = self.unit_id if unit_id is None else unit_id
+        
         try:
             # Validações
+            if not 0 <= unit_id <= modbus_config.MAX_UNIT_ID:
+                return {
+                    "success": False,
+                    "data": None,
+                    "error": f"Unit ID deve estar entre 0 e {modbus_config.MAX_UNIT_ID}"
+                }
+            
             if count <= 0 or count > modbus_config.MAX_REGISTERS_READ:
                 return {
                     "success": False,
@@ -122,12 +262,36 @@ class ModbusManager:
             
             logger.info(f"📖 Lendo registradores {start_address} a {start_address + count - 1}")
             
+            # Caminho rápido: gateway em pipeline ou codec enxuto direto no socket
+            registers = None
+            if self.gateway is not None:
+                registers = self.gateway.read_registers(
+                    FC_READ_HOLDING_REGISTERS, unit_id, start_address, count
+                )
+            elif self.codec is not None:
+                with self._io_lock:
+                    registers = self.codec.read_registers(
+                        self.client.socket, FC_READ_HOLDING_REGISTERS,
+                        unit_id, start_address, count
+                    )
+            
+            if registers is not None:
+                logger.info(f"✅ Leitura bem-sucedida: {len(registers)} registradores")
+                if notify:
+                    self._notify_sample('holding_registers', start_address, registers, unit_id)
+                return {
+                    "success": True,
+                    "data": registers,
+                    "error": None
+                }
+            
             # Executar leitura
-            response = self.client.read_holding_registers(
-                address=start_address,
-                count=count,
-                slave=self.unit_id
-            )
+            with self._io_lock:
+                response = self.client.read_holding_registers(
+                    address=start_address,
+                    count=count,
+                    slave=unit_id
+                )
             
             # Verificar se houve erro na resposta
             if response.isError():
@@ -135,22 +299,25 @@ class ModbusManager:
                 logger.error(f"❌ {error_msg}")
                 
                 # Tentar reconectar em caso de erro de conexão
-                if retries < modbus_config.MAX_RETRIES and "connection" in str(response).lower():
-                    logger.warning(f"🔄 Tentativa {retries + 1}/{modbus_config.MAX_RETRIES} de reconexão")
-                    time.sleep(1)
+                if retries < self.max_retries and "connection" in str(response).lower():
+                    logger.warning(f"🔄 Tentativa {retries + 1}/{self.max_retries} de reconexão")
+                    self._retry_sleep()
                     if self.connect():
-                        return self.read_holding_registers(start_address, count, retries + 1)
+                        return self.read_holding_registers(start_address, count, unit_id, retries + 1, notify)
                 
                 return {
                     "success": False,
                     "data": None,
-                    "error": error_msg
+                    "error": error_msg,
+                    "device_error": isinstance(response, ExceptionResponse)
                 }
             
             # Sucesso na leitura
             registers = response.registers
             logger.info(f"✅ Leitura bem-sucedida: {len(registers)} registradores")
             logger.debug(f"📊 Valores lidos: {registers}")
+            if notify:
+                self._notify_sample('holding_registers', start_address, registers, unit_id)
             
             return {
                 "success": True,
@@ -158,16 +325,29 @@ class ModbusManager:
                 "error": None
             }
             
+        except (ModbusExceptionResponse, GatewayUnitError) as e:
+            # Resposta de exceção ou falha isolada da unidade: sem reconexão
+            error_msg = f"Erro Modbus: {e}"
+            logger.error(f"❌ {error_msg}")
+            return {
+                "success": False,
+                "data": None,
+                "error": error_msg,
+                "device_error": isinstance(e, ModbusExceptionResponse)
+            }
+            
         except Exception as e:
             error_msg = f"Exceção na leitura: {str(e)}"
             logger.error(f"❌ {error_msg}")
             
+            self._reset_stream()
+            
             # Tentar reconectar em caso de exceção
-            if retries < modbus_config.MAX_RETRIES:
-                logger.warning(f"🔄 Tentativa {retries + 1}/{modbus_config.MAX_RETRIES} após exceção")
-                time.sleep(1)
+            if retries < self.max_retries:
+                logger.warning(f"🔄 Tentativa {retries + 1}/{self.max_retries} após exceção")
+                self._retry_sleep()
                 if self.connect():
-                    return self.read_holding_registers(start_address, count, retries + 1)
+                    return self.read_holding_registers(start_address, count, unit_id, retries + 1, notify)
             
             return {
                 "success": False,
@@ -175,20 +355,30 @@ class ModbusManager:
                 "error": error_msg
             }
     
-    def write_single_register(self, address: int, value: int, retries: int = 0) -> Dict[str, Union[bool, str, None]]:
+    @profiled('modbus.write_single_register')
+    def write_single_register(self, address: int, value: int, unit_id: int = None, retries: int = 0) -> Dict[str, Union[bool, str, None]]:
         """
         Escreve um valor em um registrador holding
         
         Args:
             address: Endereço do registrador
             value: Valor a ser escrito (0-65535)
+            unit_id: ID da unidade de destino (padrão: unit_id do gerenciador)
             retries: Número de tentativas de retry (uso interno)
         
         Returns:
             dict: {"success": bool, "error": str | None}
         """
+        unit_id = self.unit_id if unit_id is None else unit_id
+        
         try:
             # Validações
+            if not 0 <= unit_id <= modbus_config.MAX_UNIT_ID:
+                return {
+                    "success": False,
+                    "error": f"Unit ID deve estar entre 0 e {modbus_config.MAX_UNIT_ID}"
+                }
+            
             if address < 0:
                 return {
                     "success": False,
@@ -210,27 +400,37 @@ class ModbusManager:
             
             logger.info(f"📝 Escrevendo valor {value} no registrador {address}")
             
+            if self.gateway is not None:
+                self.gateway.write_register(unit_id, address, value)
+                logger.info(f"✅ Escrita bem-sucedida no registrador {address}")
+                return {
+                    "success": True,
+                    "error": None
+                }
+            
             # Executar escrita
-            response = self.client.write_register(
-                address=address,
-                value=value,
-                slave=self.unit_id
-            )
+            with self._io_lock:
+                response = self.client.write_register(
+                    address=address,
+                    value=value,
+                    slave=unit_id
+                )
             
             if response.isError():
                 error_msg = f"Erro Modbus na escrita: {response}"
                 logger.error(f"❌ {error_msg}")
                 
                 # Tentar reconectar em caso de erro
-                if retries < modbus_config.MAX_RETRIES and "connection" in str(response).lower():
-                    logger.warning(f"🔄 Tentativa {retries + 1}/{modbus_config.MAX_RETRIES} de reconexão")
-                    time.sleep(1)
+                if retries < self.max_retries and "connection" in str(response).lower():
+                    logger.warning(f"🔄 Tentativa {retries + 1}/{self.max_retries} de reconexão")
+                    self._retry_sleep()
                     if self.connect():
-                        return self.write_single_register(address, value, retries + 1)
+                        return self.write_single_register(address, value, unit_id, retries + 1)
                 
                 return {
                     "success": False,
-                    "error": error_msg
+                    "error": error_msg,
+                    "device_error": isinstance(response, ExceptionResponse)
                 }
             
             logger.info(f"✅ Escrita bem-sucedida no registrador {address}")
@@ -239,51 +439,74 @@ class ModbusManager:
                 "error": None
             }
             
+        except (ModbusExceptionResponse, GatewayUnitError) as e:
+            error_msg = f"Erro Modbus na escrita: {e}"
+            logger.error(f"❌ {error_msg}")
+            return {
+                "success": False,
+                "error": error_msg,
+                "device_error": isinstance(e, ModbusExceptionResponse)
+            }
+            
         except Exception as e:
             error_msg = f"Exceção na escrita: {str(e)}"
             logger.error(f"❌ {error_msg}")
             
             # Tentar reconectar em caso de exceção
-            if retries < modbus_config.MAX_RETRIES:
-                logger.warning(f"🔄 Tentativa {retries + 1}/{modbus_config.MAX_RETRIES} após exceção")
-                time.sleep(1)
+            if retries < self.max_retries:
+                logger.warning(f"🔄 Tentativa {retries + 1}/{self.max_retries} após exceção")
+                self._retry_sleep()
                 if self.connect():
-                    return self.write_single_register(address, value, retries + 1)
+                    return self.write_single_register(address, value, unit_id, retries + 1)
             
             return {
                 "success": False,
                 "error": error_msg
             }
     
-    def get_connection_info(self) -> Dict[str, Union[str, int, bool]]:
+    def get_connection_info(self) -> Dict[str, Union[str, int, bool, dict]]:
         """
         Retorna informações sobre a conexão atual
         
         Returns:
             dict: Informações da conexão
         """
-        return {
+        info = {
             "ip": self.ip,
             "port": self.port,
             "unit_id": self.unit_id,
             "timeout": self.timeout,
-            "is_connected": self.is_connected
+            "is_connected": self.is_connected,
+            "gateway": self.gateway is not None
         }
+        if self.gateway is not None:
+            info["units"] = self.gateway.units()
+        return info
         
-    def write_coil(self, address: int, value: int, retries: int = 0) -> Dict[str, Union[bool, str, None]]:
+    @profiled('modbus.write_coil')
+    def write_coil(self, address: int, value: int, unit_id: int = None, retries: int = 0) -> Dict[str, Union[bool, str, None]]:
         """
         Escreve um valor em uma bobina (coil)
         
         Args:
             address: Endereço da bobina
             value: Valor a ser escrito (0 ou 1)
+            unit_id: ID da unidade de destino (padrão: unit_id do gerenciador)
             retries: Número de tentativas de retry (uso interno)
         
         Returns:
             dict: {"success": bool, "error": str | None}
         """
+        unit_id = self.unit_id if unit_id is None else unit_id
+        
         try:
             # Validações
+            if not 0 <= unit_id <= modbus_config.MAX_UNIT_ID:
+                return {
+                    "success": False,
+                    "error": f"Unit ID deve estar entre 0 e {modbus_config.MAX_UNIT_ID}"
+                }
+            
             if address < 0:
                 return {
                     "success": False,
@@ -305,27 +528,37 @@ class ModbusManager:
             
             logger.info(f"📝 Escrevendo valor {value} na bobina {address}")
             
+            if self.gateway is not None:
+                self.gateway.write_coil(unit_id, address, value)
+                logger.info(f"✅ Escrita bem-sucedida na bobina {address}")
+                return {
+                    "success": True,
+                    "error": None
+                }
+            
             # Executar escrita
-            response = self.client.write_coil(
-                address=address,
-                value=bool(value),
-                slave=self.unit_id
-            )
+            with self._io_lock:
+                response = self.client.write_coil(
+                    address=address,
+                    value=bool(value),
+                    slave=unit_id
+                )
             
             if response.isError():
                 error_msg = f"Erro Modbus na escrita da bobina: {response}"
                 logger.error(f"❌ {error_msg}")
                 
                 # Tentar reconectar em caso de erro
-                if retries < modbus_config.MAX_RETRIES and "connection" in str(response).lower():
-                    logger.warning(f"🔄 Tentativa {retries + 1}/{modbus_config.MAX_RETRIES} de reconexão")
-                    time.sleep(1)
+                if retries < self.max_retries and "connection" in str(response).lower():
+                    logger.warning(f"🔄 Tentativa {retries + 1}/{self.max_retries} de reconexão")
+                    self._retry_sleep()
                     if self.connect():
-                        return self.write_coil(address, value, retries + 1)
+                        return self.write_coil(address, value, unit_id, retries + 1)
                 
                 return {
                     "success": False,
-                    "error": error_msg
+                    "error": error_msg,
+                    "device_error": isinstance(response, ExceptionResponse)
                 }
             
             logger.info(f"✅ Escrita bem-sucedida na bobina {address}")
@@ -334,41 +567,63 @@ class ModbusManager:
                 "error": None
             }
             
+        except (ModbusExceptionResponse, GatewayUnitError) as e:
+            error_msg = f"Erro Modbus na escrita da bobina: {e}"
+            logger.error(f"❌ {error_msg}")
+            return {
+                "success": False,
+                "error": error_msg,
+                "device_error": isinstance(e, ModbusExceptionResponse)
+            }
+            
         except Exception as e:
             error_msg = f"Exceção na escrita da bobina: {str(e)}"
             logger.error(f"❌ {error_msg}")
             
             # Tentar reconectar em caso de exceção
-            if retries < modbus_config.MAX_RETRIES:
-                logger.warning(f"🔄 Tentativa {retries + 1}/{modbus_config.MAX_RETRIES} após exceção")
-                time.sleep(1)
+            if retries < self.max_retries:
+                logger.warning(f"🔄 Tentativa {retries + 1}/{self.max_retries} após exceção")
+                self._retry_sleep()
                 if self.connect():
-                    return self.write_coil(address, value, retries + 1)
+                    return self.write_coil(address, value, unit_id, retries + 1)
             
             return {
                 "success": False,
                 "error": error_msg
             }
             
-    def read_coils(self, start_address: int, count: int, retries: int = 0) -> Dict[str, Union[bool, List[bool], str, None]]:
+    @profiled('modbus.read_coils')
+    def read_coils(self, start_address: int, count: int, unit_id: int = None, retries: int = 0,
+                   notify: bool = True) -> Dict[str, Union[bool, List[bool], array, str, None]]:
         """
         Lê bobinas (coils) do dispositivo Modbus
         
         Args:
             start_address: Endereço inicial das bobinas
             count: Quantidade de bobinas a ler
+            unit_id: ID da unidade de destino (padrão: unit_id do gerenciador)
             retries: Número de tentativas de retry (uso interno)
+            notify: Entrega a leitura ao ouvinte de amostras (False em leituras em massa)
         
         Returns:
-            dict: {"success": bool, "data": List[bool] | None, "error": str | None}
+            dict: {"success": bool, "data": List[bool] | array('B') | None, "error": str | None}
         """
+        unit_id = self.unit_id if unit_id is None else unit_id
+        
         try:
             # Validações
-            if count <= 0 or count > modbus_config.MAX_REGISTERS_READ:
+            if not 0 <= unit_id <= modbus_config.MAX_UNIT_ID:
                 return {
                     "success": False,
                     "data": None,
-                    "error": f"Quantidade inválida. Deve ser entre 1 e {modbus_config.MAX_REGISTERS_READ}"
+                    "error": f"Unit ID deve estar entre 0 e {modbus_config.MAX_UNIT_ID}"
+                }
+            
+            if count <= 0 or count > modbus_config.MAX_COILS_READ:
+                return {
+                    "success": False,
+                    "data": None,
+                    "error": f"Quantidade inválida. Deve ser entre 1 e {modbus_config.MAX_COILS_READ}"
                 }
             
             if start_address < 0:
@@ -388,12 +643,36 @@ class ModbusManager:
             
             logger.info(f"📖 Lendo bobinas {start_address} a {start_address + count - 1}")
             
+            # Caminho rápido: gateway em pipeline ou codec enxuto direto no socket
+            coils = None
+            if self.gateway is not None:
+                coils = self.gateway.read_bits(
+                    FC_READ_COILS, unit_id, start_address, count
+                )
+            elif self.codec is not None:
+                with self._io_lock:
+                    coils = self.codec.read_bits(
+                        self.client.socket, FC_READ_COILS,
+                        unit_id, start_address, count
+                    )
+            
+            if coils is not None:
+                logger.info(f"✅ Leitura bem-sucedida: {len(coils)} bobinas")
+                if notify:
+                    self._notify_sample('coils', start_address, coils, unit_id)
+                return {
+                    "success": True,
+                    "data": coils,
+                    "error": None
+                }
+            
             # Executar leitura
-            response = self.client.read_coils(
-                address=start_address,
-                count=count,
-                slave=self.unit_id
-            )
+            with self._io_lock:
+                response = self.client.read_coils(
+                    address=start_address,
+                    count=count,
+                    slave=unit_id
+                )
             
             # Verificar se houve erro na resposta
             if response.isError():
@@ -401,22 +680,25 @@ class ModbusManager:
                 logger.error(f"❌ {error_msg}")
                 
                 # Tentar reconectar em caso de erro de conexão
-                if retries < modbus_config.MAX_RETRIES and "connection" in str(response).lower():
-                    logger.warning(f"🔄 Tentativa {retries + 1}/{modbus_config.MAX_RETRIES} de reconexão")
-                    time.sleep(1)
+                if retries < self.max_retries and "connection" in str(response).lower():
+                    logger.warning(f"🔄 Tentativa {retries + 1}/{self.max_retries} de reconexão")
+                    self._retry_sleep()
                     if self.connect():
-                        return self.read_coils(start_address, count, retries + 1)
+                        return self.read_coils(start_address, count, unit_id, retries + 1, notify)
                 
                 return {
                     "success": False,
                     "data": None,
-                    "error": error_msg
+                    "error": error_msg,
+                    "device_error": isinstance(response, ExceptionResponse)
                 }
             
             # Sucesso na leitura
             coils = response.bits[:count]  # Garantir que retornamos apenas a quantidade solicitada
             logger.info(f"✅ Leitura bem-sucedida: {len(coils)} bobinas")
             logger.debug(f"📊 Valores lidos: {coils}")
+            if notify:
+                self._notify_sample('coils', start_address, coils, unit_id)
             
             return {
                 "success": True,
@@ -424,16 +706,29 @@ class ModbusManager:
                 "error": None
             }
             
+        except (ModbusExceptionResponse, GatewayUnitError) as e:
+            # Resposta de exceção ou falha isolada da unidade: sem reconexão
+            error_msg = f"Erro Modbus: {e}"
+            logger.error(f"❌ {error_msg}")
+            return {
+                "success": False,
+                "data": None,
+                "error": error_msg,
+                "device_error": isinstance(e, ModbusExceptionResponse)
+            }
+            
         except Exception as e:
             error_msg = f"Exceção na leitura de bobinas: {str(e)}"
             logger.error(f"❌ {error_msg}")
             
+            self._reset_stream()
+            
             # Tentar reconectar em caso de exceção
-            if retries < modbus_config.MAX_RETRIES:
-                logger.warning(f"🔄 Tentativa {retries + 1}/{modbus_config.MAX_RETRIES} após exceção")
-                time.sleep(1)
+            if retries < self.max_retries:
+                logger.warning(f"🔄 Tentativa {retries + 1}/{self.max_retries} após exceção")
+                self._retry_sleep()
                 if self.connect():
-                    return self.read_coils(start_address, count, retries + 1)
+                    return self.read_coils(start_address, count, unit_id, retries + 1, notify)
             
             return {
                 "success": False,
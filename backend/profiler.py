@@ -0,0 +1,301 @@
+# backend/profiler.py
+# Perfilamento sob demanda: amostragem de pilhas e tempos por etapa (spans)
+
+import functools
+import logging
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Set
+from config import profiler_config
+
+logger = logging.getLogger(__name__)
+
+MODE_SAMPLING = 'sampling'
+MODE_SPANS = 'spans'
+MODES = (MODE_SAMPLING, MODE_SPANS)
+
+# Contexto compartilhado devolvido quando o perfilamento está desligado
+_NULL_SPAN = nullcontext()
+
+
+class _State:
+    """Estado global do perfilamento (lido no caminho quente sem lock)"""
+    __slots__ = ('spans', 'sampling', 'session')
+
+    def __init__(self):
+        self.spans = False
+        self.sampling = False
+        self.session: Optional['ProfileSession'] = None
+
+
+state = _State()
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Span:
+    """Mede uma etapa e acumula o tempo no caminho de spans da thread"""
+    __slots__ = ('name', 'session', 'started', 'child_time')
+
+    def __init__(self, name: str, session: 'ProfileSession'):
+        self.name = name
+        self.session = session
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.child_time = 0.0
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        stack = _local.stack
+        path = ';'.join(span.name for span in stack)
+        stack.pop()
+        if stack:
+            stack[-1].child_time += elapsed
+        self.session.add_span(self.name, path, elapsed, elapsed - self.child_time)
+        return False
+
+
+def span(name: str):
+    """
+    Retorna um contexto que mede a etapa `name`
+
+    Com o perfilamento de spans desligado devolve sempre o mesmo
+    nullcontext, mantendo o custo em uma checagem de atributo.
+    """
+    if not state.spans:
+        return _NULL_SPAN
+    return _Span(name, state.session)
+
+
+def profiled(name: str) -> Callable:
+    """Decorador que mede cada chamada da função como a etapa `name`"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not state.spans:
+                return func(*args, **kwargs)
+            with _Span(name, state.session):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def begin_request() -> None:
+    """Registra a thread atual como atendendo uma requisição"""
+    session = state.session
+    if session is not None and state.sampling:
+        session.request_threads.add(threading.get_ident())
+
+
+def end_request() -> None:
+    session = state.session
+    if session is not None:
+        session.request_threads.discard(threading.get_ident())
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ProfileSession:
+    """Uma janela de perfilamento e seus resultados agregados"""
+
+    def __init__(self, mode: str, duration: float, interval: float):
+        self.mode = mode
+        self.duration = duration
+        self.interval = interval
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.request_threads: Set[int] = set()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        self._span_times: Dict[str, List[float]] = defaultdict(list)
+        self._span_paths: Counter = Counter()
+        self._done = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return not self._done.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def add_span(self, name: str, path: str, elapsed: float, self_time: float) -> None:
+        with self._lock:
+            self._span_times[name].append(elapsed)
+            self._span_paths[path] += int(self_time * 1e6)
+
+    def add_stack(self, stack: str) -> None:
+        with self._lock:
+            self._stacks[stack] += 1
+            self.samples += 1
+
+    def finish(self) -> None:
+        self.finished_at = time.time()
+        self._done.set()
+
+    def results(self, top: int = None) -> Dict[str, Any]:
+        """
+        Agrega os resultados da sessão
+
+        Returns:
+            dict: Resumo, funções mais frequentes, saída de pilhas no formato
+            "collapsed" (compatível com flamegraph.pl/speedscope) e, no modo
+            spans, a latência por etapa
+        """
+        top = top or profiler_config.TOP_FUNCTIONS
+        with self._lock:
+            stacks = dict(self._stacks)
+            span_times = {name: list(times) for name, times in self._span_times.items()}
+            span_paths = dict(self._span_paths)
+
+        result: Dict[str, Any] = {
+            "mode": self.mode,
+            "running": self.running,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": self.duration
+        }
+
+        if self.mode == MODE_SAMPLING:
+            self_counts: Counter = Counter()
+            total_counts: Counter = Counter()
+            for stack, count in stacks.items():
+                frames = stack.split(';')
+                self_counts[frames[-1]] += count
+                for frame in set(frames):
+                    total_counts[frame] += count
+
+            result.update({
+                "interval": self.interval,
+                "samples": self.samples,
+                "top_functions": [
+                    {
+                        "function": function,
+                        "self_samples": count,
+                        "total_samples": total_counts[function],
+                        "self_percent": round(100.0 * count / self.samples, 2) if self.samples else 0.0
+                    }
+                    for function, count in self_counts.most_common(top)
+                ],
+                "collapsed": '\n'.join(f"{stack} {count}" for stack, count in sorted(stacks.items()))
+            })
+        else:
+            result.update({
+                "stages": [
+                    {
+                        "stage": name,
+                        "count": len(times),
+                        "total_ms": round(sum(times) * 1000, 3),
+                        "mean_ms": round(sum(times) / len(times) * 1000, 3),
+                        "p50_ms": round(_percentile(times, 0.50) * 1000, 3),
+                        "p95_ms": round(_percentile(times, 0.95) * 1000, 3),
+                        "max_ms": round(max(times) * 1000, 3)
+                    }
+                    for name, times in sorted(span_times.items(), key=lambda item: -sum(item[1]))
+                ],
+                # Pilhas de spans com tempo próprio em µs, no mesmo formato "collapsed"
+                "collapsed": '\n'.join(f"{path} {micros}" for path, micros in sorted(span_paths.items()))
+            })
+
+        return result
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def _sampler(session: ProfileSession, deadline: float) -> None:
+    """Amostra periodicamente as pilhas das threads que atendem requisições"""
+    own_id = threading.get_ident()
+    while time.monotonic() < deadline and state.session is session:
+        frames = sys._current_frames()
+        for thread_id in list(session.request_threads):
+            if thread_id == own_id:
+                continue
+            frame = frames.get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                session.add_stack(';'.join(reversed(stack)))
+        del frames
+        time.sleep(session.interval)
+    stop(session)
+
+
+def _expire(session: ProfileSession, deadline: float) -> None:
+    while time.monotonic() < deadline and state.session is session and session.running:
+        session.wait(deadline - time.monotonic())
+    stop(session)
+
+
+def start(mode: str, duration: float = None, interval: float = None) -> ProfileSession:
+    """
+    Inicia uma janela de perfilamento
+
+    Args:
+        mode: 'sampling' (amostragem de pilhas) ou 'spans' (tempo por etapa)
+        duration: Duração da janela em segundos (limitada por MAX_DURATION)
+        interval: Intervalo de amostragem em segundos (apenas no modo sampling)
+
+    Raises:
+        ValueError: Se o modo ou os parâmetros forem inválidos ou já houver uma sessão ativa
+    """
+    if mode not in MODES:
+        raise ValueError(f"Modo inválido. Deve ser um de {', '.join(MODES)}")
+
+    duration = float(duration or profiler_config.DEFAULT_DURATION)
+    interval = float(interval or profiler_config.DEFAULT_INTERVAL)
+    if duration <= 0 or duration > profiler_config.MAX_DURATION:
+        raise ValueError(f"Duração deve estar entre 0 e {profiler_config.MAX_DURATION} segundos")
+    if interval < profiler_config.MIN_INTERVAL:
+        raise ValueError(f"Intervalo mínimo de amostragem é {profiler_config.MIN_INTERVAL} segundos")
+
+    with _lock:
+        if state.session is not None and state.session.running:
+            raise ValueError("Já existe uma sessão de perfilamento em andamento")
+
+        session = ProfileSession(mode, duration, interval)
+        state.session = session
+        state.sampling = mode == MODE_SAMPLING
+        state.spans = mode == MODE_SPANS
+
+    deadline = time.monotonic() + duration
+    target = _sampler if mode == MODE_SAMPLING else _expire
+    threading.Thread(target=target, args=(session, deadline), daemon=True).start()
+
+    logger.info(f"🔬 Perfilamento '{mode}' iniciado por {duration}s")
+    return session
+
+
+def stop(session: ProfileSession = None) -> Optional[ProfileSession]:
+    """Encerra a sessão ativa (ou a sessão informada, se ainda for a ativa)"""
+    with _lock:
+        current = state.session
+        if current is None or (session is not None and session is not current):
+            return current
+        if current.running:
+            state.spans = False
+            state.sampling = False
+            current.request_threads.clear()
+            current.finish()
+            logger.info(f"🔬 Perfilamento '{current.mode}' encerrado")
+    return current
+
+
+def current_session() -> Optional[ProfileSession]:
+    return state.session
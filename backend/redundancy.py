@@ -0,0 +1,369 @@
+# backend/redundancy.py
+# Dispositivos com endpoints redundantes: leituras com hedge e failover de escritas
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from config import modbus_config, redundancy_config
+from backend.modbus_manager import ModbusManager
+from backend.traffic_capture import TrafficRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointHealth:
+    """Saúde de um endpoint a partir das latências e falhas observadas"""
+
+    def __init__(self):
+        self.latencies: deque = deque(maxlen=redundancy_config.LATENCY_WINDOW)
+        self.ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.hedges_won = 0
+        self.down_until = 0.0
+        self.connection_lost_until = 0.0
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        alpha = redundancy_config.EWMA_ALPHA
+        self.ewma = latency if self.ewma is None else alpha * latency + (1 - alpha) * self.ewma
+        self.consecutive_failures = 0
+        self.successes += 1
+        self.down_until = 0.0
+        self.connection_lost_until = 0.0
+
+    def record_failure(self, connection_lost: bool) -> None:
+        """
+        Registra uma falha do endpoint
+
+        Args:
+            connection_lost: True se a reconexão ao endpoint falhou
+                (falha confirmada, a única que desvia escritas)
+        """
+        self.consecutive_failures += 1
+        self.failures += 1
+        self.down_until = time.monotonic() + redundancy_config.ENDPOINT_COOLDOWN
+        if connection_lost:
+            self.connection_lost_until = self.down_until
+
+    @property
+    def is_down(self) -> bool:
+        return self.down_until > time.monotonic()
+
+    @property
+    def connection_lost(self) -> bool:
+        return self.connection_lost_until > time.monotonic()
+
+    def score(self) -> float:
+        """Pontuação (menor é melhor): latência média ponderada mais penalidade por falhas"""
+        base = self.ewma if self.ewma is not None else 0.0
+        return base + self.consecutive_failures * redundancy_config.FAILURE_PENALTY
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if len(self.latencies) < redundancy_config.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        p95 = self.percentile(0.95)
+        return {
+            "down": self.is_down,
+            "connection_lost": self.connection_lost,
+            "ewma_ms": None if self.ewma is None else round(self.ewma * 1000, 3),
+            "p95_ms": None if p95 is None else round(p95 * 1000, 3),
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "hedges_won": self.hedges_won
+        }
+
+
+class Endpoint:
+    """Um caminho de rede até o dispositivo (interface ou CPU redundante)"""
+
+    def __init__(self, name: str, manager: ModbusManager):
+        self.name = name
+        self.manager = manager
+        self.health = EndpointHealth()
+        # O cliente de cada endpoint é síncrono: uma operação por vez
+        self.lock = threading.Lock()
+
+
+class RedundantDevice:
+    """
+    Dispositivo acessível por vários endpoints, com a mesma interface do ModbusManager
+
+    Leituras vão ao endpoint mais saudável e, se ele passar do percentil de
+    latência configurado, são duplicadas (hedge) para o próximo endpoint;
+    vence a primeira resposta bem-sucedida. Escritas nunca são duplicadas:
+    só migram para outro endpoint após falha confirmada do atual (reconexão
+    recusada), evitando escrita dupla em caso de timeout ambíguo.
+    """
+
+    def __init__(self, endpoints: Sequence[Dict[str, Any]], unit_id: int = None, timeout: float = None,
+                 fast_codec: bool = None):
+        """
+        Inicializa o dispositivo redundante
+
+        Args:
+            endpoints: Lista de {"ip": str, "port": int} em ordem de preferência
+            unit_id: ID da unidade Modbus padrão (padrão: 1)
+            timeout: Timeout por endpoint em segundos (padrão: redundancy_config.ENDPOINT_TIMEOUT)
+            fast_codec: Usa o codec enxuto nas leituras
+        """
+        if not endpoints:
+            raise ValueError("Pelo menos um endpoint é obrigatório")
+
+        self.unit_id = unit_id or modbus_config.DEFAULT_UNIT_ID
+        self.timeout = timeout or redundancy_config.ENDPOINT_TIMEOUT
+        self.gateway = None
+        self.endpoints: List[Endpoint] = []
+        for definition in endpoints:
+            ip = definition['ip']
+            port = int(definition.get('port') or modbus_config.DEFAULT_PORT)
+            manager = ModbusManager(
+                ip=ip,
+                port=port,
+                unit_id=self.unit_id,
+                timeout=self.timeout,
+                fast_codec=fast_codec,
+                gateway=False,
+                # Sem o laço de reconexão: o failover é feito entre endpoints
+                max_retries=0
+            )
+            self.endpoints.append(Endpoint(f"{ip}:{port}", manager))
+
+        self.ip = self.endpoints[0].manager.ip
+        self.port = self.endpoints[0].manager.port
+        self._sample_listener = None
+        self._recorder: Optional[TrafficRecorder] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=2 * len(self.endpoints),
+            thread_name_prefix='modbus-hedge'
+        )
+
+    # ------------------------------------------------------------------
+    # Interface compatível com ModbusManager
+    # ------------------------------------------------------------------
+
+    @property
+    def is_connected(self) -> bool:
+        return any(endpoint.manager.is_connected for endpoint in self.endpoints)
+
+    @property
+    def sample_listener(self):
+        return self._sample_listener
+
+    @sample_listener.setter
+    def sample_listener(self, listener) -> None:
+        self._sample_listener = listener
+        for endpoint in self.endpoints:
+            endpoint.manager.sample_listener = listener
+
+    @property
+    def recorder(self) -> Optional[TrafficRecorder]:
+        return self._recorder
+
+    @recorder.setter
+    def recorder(self, recorder: Optional[TrafficRecorder]) -> None:
+        self._recorder = recorder
+        for endpoint in self.endpoints:
+            endpoint.manager.recorder = recorder
+
+    def set_recorder(self, recorder: Optional[TrafficRecorder]) -> None:
+        self._recorder = recorder
+        for endpoint in self.endpoints:
+            endpoint.manager.set_recorder(recorder)
+
+    def connect(self) -> bool:
+        """Conecta todos os endpoints; basta um disponível"""
+        futures = [self._executor.submit(endpoint.manager.connect) for endpoint in self.endpoints]
+        connected = False
+        for endpoint, future in zip(self.endpoints, futures):
+            if future.result():
+                connected = True
+            else:
+                endpoint.health.record_failure(connection_lost=True)
+        return connected
+
+    def disconnect(self) -> None:
+        """Desconecta todos os endpoints e libera as threads de hedge (o dispositivo não é reutilizado)"""
+        for endpoint in self.endpoints:
+            endpoint.manager.disconnect()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_connection_info(self) -> Dict[str, Any]:
+        info = {
+            "ip": self.ip,
+            "port": self.port,
+            "unit_id": self.unit_id,
+            "timeout": self.timeout,
+            "is_connected": self.is_connected,
+            "gateway": False,
+            "endpoints": [
+                dict(name=endpoint.name, connected=endpoint.manager.is_connected, **endpoint.health.to_dict())
+                for endpoint in self._ranked()
+            ]
+        }
+        return info
+
+    def read_holding_registers(self, start_address: int, count: int, unit_id: int = None,
+                               notify: bool = True) -> Dict[str, Any]:
+        return self._hedged_read(
+            lambda manager: manager.read_holding_registers(start_address, count, unit_id, notify=notify)
+        )
+
+    def read_coils(self, start_address: int, count: int, unit_id: int = None,
+                   notify: bool = True) -> Dict[str, Any]:
+        return self._hedged_read(lambda manager: manager.read_coils(start_address, count, unit_id, notify=notify))
+
+    def write_single_register(self, address: int, value: int, unit_id: int = None) -> Dict[str, Any]:
+        return self._failover_write(lambda manager: manager.write_single_register(address, value, unit_id))
+
+    def write_coil(self, address: int, value: int, unit_id: int = None) -> Dict[str, Any]:
+        return self._failover_write(lambda manager: manager.write_coil(address, value, unit_id))
+
+    # ------------------------------------------------------------------
+    # Seleção de endpoints
+    # ------------------------------------------------------------------
+
+    def _ranked(self) -> List[Endpoint]:
+        """Endpoints ordenados: disponíveis primeiro, depois pela pontuação (estável na preferência)"""
+        return sorted(self.endpoints, key=lambda endpoint: (endpoint.health.is_down, endpoint.health.score()))
+
+    def _hedge_delay(self, endpoint: Endpoint) -> float:
+        observed = endpoint.health.percentile(redundancy_config.HEDGE_PERCENTILE)
+        if observed is None:
+            return redundancy_config.HEDGE_DEFAULT_DELAY
+        return max(observed, redundancy_config.HEDGE_MIN_DELAY)
+
+    @staticmethod
+    def _is_endpoint_failure(result: Dict[str, Any]) -> bool:
+        """Falha atribuível ao caminho de rede (não uma exceção Modbus do dispositivo)"""
+        return not result["success"] and not result.get("device_error")
+
+    def _call(self, endpoint: Endpoint, operation: Callable[[ModbusManager], Dict[str, Any]],
+              lock_timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Executa a operação no endpoint, registrando latência e falhas
+
+        Args:
+            lock_timeout: Espera pelo endpoint ocupado (0: não espera; -1: sem limite)
+
+        Returns:
+            dict | None: Resultado da operação, ou None se o endpoint estava ocupado
+        """
+        if not endpoint.lock.acquire(timeout=lock_timeout):
+            return None
+        try:
+            started = time.perf_counter()
+            result = operation(endpoint.manager)
+            elapsed = time.perf_counter() - started
+        finally:
+            endpoint.lock.release()
+
+        if self._is_endpoint_failure(result):
+            # Só uma reconexão que falhou confirma a perda; socket fechado por timeout não
+            endpoint.health.record_failure(connection_lost=endpoint.manager.connect_failed)
+            logger.warning(f"⚠️ Falha no endpoint {endpoint.name}: {result['error']}")
+        else:
+            endpoint.health.record_success(elapsed)
+        return result
+
+    # ------------------------------------------------------------------
+    # Leituras com hedge
+    # ------------------------------------------------------------------
+
+    def _hedged_read(self, operation: Callable[[ModbusManager], Dict[str, Any]]) -> Dict[str, Any]:
+        candidates = self._ranked()
+        in_flight: Dict[Future, Endpoint] = {}
+        launched: List[Endpoint] = []
+        last_result: Optional[Dict[str, Any]] = None
+        next_index = 0
+
+        def launch(blocking: bool) -> bool:
+            nonlocal next_index
+            while next_index < len(candidates):
+                endpoint = candidates[next_index]
+                next_index += 1
+                if endpoint.lock.locked() and not blocking:
+                    # Ocupado com uma requisição anterior (ex.: hedge perdedor ainda em curso)
+                    continue
+                if endpoint.health.is_down and in_flight:
+                    # Endpoint em espera só é usado como último recurso, nunca como hedge
+                    continue
+                lock_timeout = self.timeout if blocking else 0
+                in_flight[self._executor.submit(self._call, endpoint, operation, lock_timeout)] = endpoint
+                launched.append(endpoint)
+                return True
+            return False
+
+        if not launch(blocking=False):
+            # Todos ocupados: aguarda o mais bem classificado
+            next_index = 0
+            launch(blocking=True)
+
+        while in_flight:
+            primary = next(iter(in_flight.values()))
+            done, _ = wait(list(in_flight), timeout=self._hedge_delay(primary), return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Passou do percentil de latência: dispara o hedge no próximo endpoint
+                if launch(blocking=False):
+                    logger.info(f"🪂 Hedge de leitura disparado após {self._hedge_delay(primary) * 1000:.0f}ms")
+                    continue
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                endpoint = in_flight.pop(future)
+                result = future.result()
+                if result is None:
+                    continue
+                if result["success"] or result.get("device_error"):
+                    if endpoint is not launched[0]:
+                        endpoint.health.hedges_won += 1
+                    return result
+                last_result = result
+
+            # Falha confirmada sem outra tentativa em curso: failover imediato
+            if not in_flight:
+                launch(blocking=False)
+
+        return last_result or {
+            "success": False,
+            "data": None,
+            "error": "Nenhum endpoint disponível"
+        }
+
+    # ------------------------------------------------------------------
+    # Escritas com failover
+    # ------------------------------------------------------------------
+
+    def _failover_write(self, operation: Callable[[ModbusManager], Dict[str, Any]]) -> Dict[str, Any]:
+        # Ordem de preferência configurada, pulando apenas endpoints com falha confirmada
+        ordered = sorted(self.endpoints, key=lambda endpoint: endpoint.health.connection_lost)
+        result: Optional[Dict[str, Any]] = None
+        for endpoint in ordered:
+            # Endpoint ocupado não é falha: espera a operação em curso terminar
+            # (limitada pelos timeouts do gerenciador) em vez de migrar a escrita
+            result = self._call(endpoint, operation, lock_timeout=-1)
+
+            if result["success"] or result.get("device_error"):
+                return result
+
+            # Só muda de endpoint quando a reconexão falhou (perda confirmada);
+            # um timeout pode ter aplicado a escrita, mesmo com o socket já fechado localmente
+            if not endpoint.manager.connect_failed:
+                return result
+
+            logger.warning(f"🔀 Failover de escrita: {endpoint.name} indisponível")
+
+        return result or {
+            "success": False,
+            "error": "Nenhum endpoint disponível"
+        }
@@ -1,11 +1,21 @@
 # backend/routes.py
 # Rotas da API Flask para o Modbus TCP Manager
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import hmac
+import json
 import logging
+import os
+import time
+from array import array
 from typing import Dict, Any, Optional
 from backend.modbus_manager import ModbusManager
-from config import modbus_config
+from backend.redundancy import RedundantDevice
+from backend.bulk_export import ExportRequest, export_stream, FORMAT_CSV, FORMAT_NDJSON, FORMATS
+from backend.alarm_engine import AlarmEngine, AlarmRule
+from backend.traffic_capture import TrafficRecorder
+from backend import profiler
+from config import modbus_config, flask_config
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +25,32 @@ api_bp = Blueprint('api', __name__, url_prefix='/api')
 # Instância global do gerenciador Modbus
 modbus_manager: Optional[ModbusManager] = None
 
+# Motor de alarmes alimentado pelas leituras do gerenciador
+alarm_engine = AlarmEngine()
+
+# Gravador de tráfego ativo (None quando a captura está desligada)
+traffic_recorder: Optional[TrafficRecorder] = None
+
+# Captura encerrada via API: a captura configurada por ambiente não é reaberta
+capture_stopped = False
+
+
+def _get_unit_id(data: Dict[str, Any]) -> Optional[int]:
+    """Extrai o unit id opcional da requisição (None usa o padrão do gerenciador)"""
+    unit_id = data.get('unit_id')
+    return None if unit_id is None else int(unit_id)
+
 
 @api_bp.route('/connect', methods=['POST'])
 def connect() -> Dict[str, Any]:
     """Conecta ao dispositivo Modbus"""
-    global modbus_manager
+    global modbus_manager, traffic_recorder
     
     try:
         data = request.get_json()
-        ip = data.get('ip')
+        # Endpoints redundantes do mesmo dispositivo: [{"ip": str, "port": int}, ...]
+        endpoints = data.get('endpoints')
+        ip = data.get('ip') or (endpoints[0].get('ip') if endpoints else None)
         
         if not ip:
             return jsonify({
@@ -31,20 +58,47 @@ def connect() -> Dict[str, Any]:
                 "error": "IP do dispositivo não fornecido"
             }), 400
         
+        # Timeouts por unidade no modo gateway: {"unit_id": segundos}
+        unit_timeouts = {
+            int(unit_id): float(timeout)
+            for unit_id, timeout in (data.get('unit_timeouts') or {}).items()
+        }
+        
+        # Fechar a conexão anterior (um gateway aceita poucas conexões)
+        if modbus_manager:
+            modbus_manager.disconnect()
+        
         # Criar novo gerenciador Modbus
-        modbus_manager = ModbusManager(
-            ip=ip,
-            port=modbus_config.DEFAULT_PORT,
-            unit_id=modbus_config.DEFAULT_UNIT_ID,
-            timeout=modbus_config.DEFAULT_TIMEOUT
-        )
+        if endpoints:
+            modbus_manager = RedundantDevice(
+                endpoints=endpoints,
+                unit_id=_get_unit_id(data) or modbus_config.DEFAULT_UNIT_ID
+            )
+        else:
+            modbus_manager = ModbusManager(
+                ip=ip,
+                port=data.get('port') or modbus_config.DEFAULT_PORT,
+                unit_id=_get_unit_id(data) or modbus_config.DEFAULT_UNIT_ID,
+                timeout=modbus_config.DEFAULT_TIMEOUT,
+                gateway=data.get('gateway'),
+                unit_timeouts=unit_timeouts
+            )
+        modbus_manager.sample_listener = alarm_engine.process
+        
+        # Captura contínua configurada por ambiente: acrescenta ao arquivo existente
+        # e não é recriada depois de uma parada explícita via API
+        if traffic_recorder is None and modbus_config.CAPTURE_FILE and not capture_stopped:
+            traffic_recorder = TrafficRecorder(modbus_config.CAPTURE_FILE, mode='a')
+        modbus_manager.recorder = traffic_recorder
         
         if modbus_manager.connect():
             return jsonify({
                 "status": "connected",
                 "clp_ip": ip,
                 "unit_id": modbus_manager.unit_id,
-                "timeout": modbus_manager.timeout
+                "timeout": modbus_manager.timeout,
+                "gateway": modbus_manager.gateway is not None,
+                "endpoints": len(endpoints) if endpoints else 1
             })
         else:
             return jsonify({
@@ -87,9 +141,10 @@ def read_registers() -> Dict[str, Any]:
         data = request.get_json()
         start_address = data.get('start_address', 0)
         count = data.get('count', 10)
+        unit_id = _get_unit_id(data)
         
         # Executar leitura
-        result = modbus_manager.read_holding_registers(start_address, count)
+        result = modbus_manager.read_holding_registers(start_address, count, unit_id)
         
         if result["success"]:
             return jsonify({
@@ -97,7 +152,7 @@ def read_registers() -> Dict[str, Any]:
                 "registers": result["data"],
                 "start_address": start_address,
                 "count": len(result["data"]),
-                "unit_id": modbus_manager.unit_id
+                "unit_id": modbus_manager.unit_id if unit_id is None else unit_id
             })
         else:
             return jsonify({
@@ -105,6 +160,11 @@ def read_registers() -> Dict[str, Any]:
                 "error": result["error"]
             }), 500
             
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": f"Erro de conversão: {str(e)}"
+        }), 400
     except Exception as e:
         logger.error(f"Erro na API read_registers: {e}")
         return jsonify({
@@ -128,6 +188,7 @@ def write_register() -> Dict[str, Any]:
         data = request.get_json()
         address = data.get('address')
         value = data.get('value')
+        unit_id = _get_unit_id(data)
         
         # Validação básica
         if address is None or value is None:
@@ -137,14 +198,14 @@ def write_register() -> Dict[str, Any]:
             }), 400
         
         # Executar escrita
-        result = modbus_manager.write_single_register(address, value)
+        result = modbus_manager.write_single_register(address, value, unit_id)
         
         if result["success"]:
             return jsonify({
                 "success": True,
                 "address": address,
                 "value": value,
-                "unit_id": modbus_manager.unit_id
+                "unit_id": modbus_manager.unit_id if unit_id is None else unit_id
             })
         else:
             return jsonify({
@@ -152,6 +213,11 @@ def write_register() -> Dict[str, Any]:
                 "error": result["error"]
             }), 500
             
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": f"Erro de conversão: {str(e)}"
+        }), 400
     except Exception as e:
         logger.error(f"Erro na API write_register: {e}")
         return jsonify({
@@ -172,7 +238,8 @@ def get_status():
             "ip": connection_info["ip"],
             "port": connection_info["port"],
             "unit_id": connection_info["unit_id"],
-            "timeout": connection_info["timeout"]
+            "timeout": connection_info["timeout"],
+            "gateway": connection_info["gateway"]
         })
     else:
         return jsonify({"status": "disconnected"})
@@ -197,8 +264,9 @@ def write_coil():
     try:
         address = int(data['address'])
         value = int(data['value'])
+        unit_id = _get_unit_id(data)
         
-        result = modbus_manager.write_coil(address, value)
+        result = modbus_manager.write_coil(address, value, unit_id)
         
         if result['success']:
             return jsonify({
@@ -242,13 +310,19 @@ def read_coils():
     try:
         start_address = int(data['start_address'])
         count = int(data['count'])
+        unit_id = _get_unit_id(data)
         
-        result = modbus_manager.read_coils(start_address, count)
+        result = modbus_manager.read_coils(start_address, count, unit_id)
         
         if result['success']:
+            coils = result['data']
+            # O codec enxuto já entrega array('B') com 0/1
+            if not isinstance(coils, array):
+                coils = [int(coil) for coil in coils]
+            
             return jsonify({
                 "status": "success",
-                "coils": [int(coil) for coil in result['data']],
+                "coils": coils,
                 "message": f"Leitura de {count} bobinas a partir do endereço {start_address}"
             })
         else:
@@ -266,4 +340,359 @@ def read_coils():
         return jsonify({
             "status": "error",
             "message": f"Erro ao ler bobinas: {str(e)}"
-        }), 500
\ No newline at end of file
+        }), 500
+
+@api_bp.route('/export', methods=['GET'])
+def export_memory():
+    """Exporta faixas de registradores e bobinas em fluxo (CSV ou NDJSON)"""
+    if not modbus_manager:
+        return jsonify({
+            "success": False,
+            "error": "Dispositivo não conectado"
+        }), 400
+    
+    output_format = request.args.get('format', FORMAT_CSV)
+    if output_format not in FORMATS:
+        return jsonify({
+            "success": False,
+            "error": f"Formato inválido. Deve ser um de {', '.join(FORMATS)}"
+        }), 400
+    
+    try:
+        export = ExportRequest.from_args(request.args, modbus_manager.unit_id)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    
+    logger.info(f"📦 Exportando {export.count} endereços de {', '.join(export.tables)} (unidade {export.unit_id})")
+    mimetype = 'application/x-ndjson' if output_format == FORMAT_NDJSON else 'text/csv'
+    return Response(
+        # Referência fixa ao gerenciador: uma reconexão não troca o dispositivo no meio do arquivo
+        stream_with_context(export_stream(modbus_manager, export, output_format)),
+        mimetype=mimetype,
+        headers={
+            "Cache-Control": "no-cache",
+            "Content-Disposition": f"attachment; filename=modbus_export.{output_format}"
+        }
+    )
+
+
+@api_bp.route('/gateway/units', methods=['GET'])
+def get_gateway_units():
+    """Retorna o estado de agendamento e falhas de cada unidade do gateway"""
+    if not modbus_manager or modbus_manager.gateway is None:
+        return jsonify({
+            "success": False,
+            "error": "Gerenciador não está em modo gateway"
+        }), 400
+    
+    return jsonify({
+        "success": True,
+        "units": list(modbus_manager.gateway.units().values())
+    })
+
+
+@api_bp.route('/endpoints', methods=['GET'])
+def get_endpoints():
+    """Retorna a saúde de cada endpoint de um dispositivo redundante"""
+    if not isinstance(modbus_manager, RedundantDevice):
+        return jsonify({
+            "success": False,
+            "error": "Dispositivo não está configurado com endpoints redundantes"
+        }), 400
+    
+    return jsonify({
+        "success": True,
+        "endpoints": modbus_manager.get_connection_info()["endpoints"]
+    })
+
+
+@api_bp.route('/alarms', methods=['GET'])
+def get_alarms():
+    """Retorna os alarmes atualmente ativos"""
+    return jsonify({
+        "success": True,
+        "alarms": alarm_engine.active_alarms()
+    })
+
+
+@api_bp.route('/alarms/rules', methods=['GET'])
+def get_alarm_rules():
+    """Lista as regras de alarme registradas"""
+    return jsonify({
+        "success": True,
+        "rules": alarm_engine.list_rules()
+    })
+
+
+@api_bp.route('/alarms/rules', methods=['POST'])
+def add_alarm_rule():
+    """Registra (ou substitui) uma regra de alarme"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "success": False,
+            "error": "Definição da regra não fornecida"
+        }), 400
+    
+    try:
+        rule = AlarmRule.from_dict(data)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    
+    alarm_engine.add_rule(rule)
+    return jsonify({
+        "success": True,
+        "rule": rule.to_dict()
+    })
+
+
+@api_bp.route('/alarms/rules/<rule_id>', methods=['DELETE'])
+def delete_alarm_rule(rule_id: str):
+    """Remove uma regra de alarme"""
+    if not alarm_engine.remove_rule(rule_id):
+        return jsonify({
+            "success": False,
+            "error": f"Regra '{rule_id}' não encontrada"
+        }), 404
+    
+    return jsonify({"success": True})
+
+
+@api_bp.route('/alarms/events', methods=['GET'])
+def get_alarm_events():
+    """Retorna as transições de alarme posteriores à sequência informada"""
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": f"Erro de conversão: {str(e)}"
+        }), 400
+    
+    events = alarm_engine.events_since(since)
+    return jsonify({
+        "success": True,
+        "events": events,
+        "last_sequence": events[-1]["sequence"] if events else since
+    })
+
+
+@api_bp.route('/alarms/stream', methods=['GET'])
+def stream_alarm_events():
+    """Publica as transições de alarme via Server-Sent Events"""
+    try:
+        # Reconexões do EventSource informam o último evento recebido
+        since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": f"Erro de conversão: {str(e)}"
+        }), 400
+    
+    def generate():
+        for event in alarm_engine.stream(since):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"id: {event['sequence']}\ndata: {json.dumps(event)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@api_bp.route('/capture', methods=['GET'])
+def get_capture_status():
+    """Retorna o estado da captura de tráfego"""
+    if traffic_recorder is None:
+        return jsonify({"capturing": False})
+    
+    return jsonify({
+        "capturing": True,
+        "file": traffic_recorder.path,
+        "records": traffic_recorder.records
+    })
+
+
+@api_bp.route('/capture/start', methods=['POST'])
+def start_capture():
+    """Inicia a gravação do tráfego Modbus em arquivo binário"""
+    global traffic_recorder
+    
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    if traffic_recorder is not None:
+        return jsonify({
+            "success": False,
+            "error": f"Captura já em andamento em {traffic_recorder.path}"
+        }), 400
+    
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get('file') or f"modbus_capture_{time.strftime('%Y%m%d_%H%M%S')}.bin")
+    
+    # Apenas um nome de arquivo, sempre dentro do diretório de capturas configurado
+    if os.path.basename(filename) != filename or filename in ('.', '..'):
+        return jsonify({
+            "success": False,
+            "error": "Informe apenas o nome do arquivo de captura, sem diretórios"
+        }), 400
+    path = os.path.join(modbus_config.CAPTURE_DIR, filename)
+    
+    try:
+        os.makedirs(modbus_config.CAPTURE_DIR, exist_ok=True)
+        traffic_recorder = TrafficRecorder(path, mode='x')
+    except FileExistsError:
+        return jsonify({
+            "success": False,
+            "error": f"Arquivo de captura já existe: {filename}"
+        }), 409
+    except OSError as e:
+        return jsonify({
+            "success": False,
+            "error": f"Não foi possível criar o arquivo de captura: {str(e)}"
+        }), 500
+    
+    if modbus_manager:
+        modbus_manager.set_recorder(traffic_recorder)
+    
+    return jsonify({
+        "success": True,
+        "file": path
+    })
+
+
+@api_bp.route('/capture/stop', methods=['POST'])
+def stop_capture():
+    """Encerra a gravação do tráfego Modbus"""
+    global traffic_recorder, capture_stopped
+    
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    if traffic_recorder is None:
+        return jsonify({
+            "success": False,
+            "error": "Nenhuma captura em andamento"
+        }), 400
+    
+    if modbus_manager:
+        modbus_manager.set_recorder(None)
+    
+    recorder, traffic_recorder = traffic_recorder, None
+    recorder.close()
+    capture_stopped = True
+    
+    return jsonify({
+        "success": True,
+        "file": recorder.path,
+        "records": recorder.records
+    })
+
+
+def _require_admin():
+    """Retorna uma resposta de erro se a requisição não tiver o token de administrador"""
+    if not flask_config.ADMIN_TOKEN:
+        return jsonify({
+            "success": False,
+            "error": "Endpoints administrativos desabilitados (ADMIN_TOKEN não configurado)"
+        }), 403
+    
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token, flask_config.ADMIN_TOKEN):
+        return jsonify({
+            "success": False,
+            "error": "Token de administrador inválido"
+        }), 401
+    
+    return None
+
+
+def _profile_response(session: profiler.ProfileSession):
+    """Formata os resultados como JSON ou como pilhas "collapsed" em texto"""
+    results = session.results()
+    if request.args.get('format') == 'collapsed':
+        return Response(results["collapsed"] + '\n', mimetype='text/plain')
+    
+    return jsonify({
+        "success": True,
+        "profile": results
+    })
+
+
+@api_bp.route('/admin/profile', methods=['POST'])
+def start_profile():
+    """Inicia uma janela de perfilamento (amostragem ou spans por etapa)"""
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        session = profiler.start(
+            data.get('mode', profiler.MODE_SAMPLING),
+            data.get('duration'),
+            data.get('interval')
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    
+    # Opcionalmente aguarda o fim da janela e já devolve os resultados
+    if data.get('wait'):
+        session.wait(session.duration + 1)
+        return _profile_response(session)
+    
+    return jsonify({
+        "success": True,
+        "mode": session.mode,
+        "duration": session.duration
+    })
+
+
+@api_bp.route('/admin/profile', methods=['GET'])
+def get_profile():
+    """Retorna os resultados da sessão de perfilamento atual ou da última"""
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    session = profiler.current_session()
+    if session is None:
+        return jsonify({
+            "success": False,
+            "error": "Nenhuma sessão de perfilamento registrada"
+        }), 404
+    
+    return _profile_response(session)
+
+
+@api_bp.route('/admin/profile', methods=['DELETE'])
+def stop_profile():
+    """Encerra antecipadamente a sessão de perfilamento"""
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    session = profiler.stop()
+    if session is None:
+        return jsonify({
+            "success": False,
+            "error": "Nenhuma sessão de perfilamento registrada"
+        }), 404
+    
+    return _profile_response(session)
@@ -0,0 +1,244 @@
+# backend/traffic_capture.py
+# Gravação do tráfego Modbus TCP em log binário compacto
+
+import logging
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalho do arquivo de captura
+CAPTURE_MAGIC = b'MBCAP\x00\x01\x00'
+
+# Registro: instante (epoch), latência (µs), status, unit id, tamanho do PDU de requisição e de resposta
+RECORD_HEADER = struct.Struct('>dIBBHH')
+
+# Status de cada transação gravada
+STATUS_OK = 0
+STATUS_NO_RESPONSE = 1
+
+_MBAP_LENGTH = struct.Struct('>HHH')
+
+
+@dataclass
+class CaptureRecord:
+    """Uma transação gravada (PDUs sem o cabeçalho MBAP)"""
+    timestamp: float
+    latency: float
+    status: int
+    unit_id: int
+    request: bytes
+    response: bytes
+
+    @property
+    def function_code(self) -> int:
+        return self.request[0] if self.request else 0
+
+
+class TrafficRecorder:
+    """Grava transações Modbus em um arquivo binário"""
+
+    def __init__(self, path: str, mode: str = 'w'):
+        """
+        Abre o arquivo de captura para escrita
+
+        Args:
+            path: Caminho do arquivo de captura
+            mode: 'w' sobrescreve, 'x' falha com FileExistsError se o arquivo
+                existir, 'a' acrescenta a uma captura existente
+
+        Raises:
+            ValueError: Modo inválido, ou modo 'a' sobre um arquivo que não é captura
+        """
+        if mode not in ('w', 'x', 'a'):
+            raise ValueError(f"Modo de captura inválido: {mode}")
+        if mode == 'a' and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as existing:
+                if existing.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+                    raise ValueError(f"Arquivo de captura inválido: {path}")
+
+        self.path = path
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = open(path, mode + 'b')
+        if self._file.tell() == 0:
+            self._file.write(CAPTURE_MAGIC)
+        logger.info(f"⏺️ Captura de tráfego iniciada em {path}")
+
+    def record(self, timestamp: float, latency: float, status: int, unit_id: int,
+               request: bytes, response: bytes = b'') -> None:
+        """Acrescenta uma transação ao arquivo"""
+        header = RECORD_HEADER.pack(
+            timestamp, min(int(latency * 1e6), 0xFFFFFFFF), status, unit_id,
+            len(request), len(response)
+        )
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(header)
+            self._file.write(request)
+            self._file.write(response)
+            self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        logger.info(f"⏹️ Captura de tráfego encerrada: {self.records} transações em {self.path}")
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None
+
+
+def read_capture(path: str) -> Iterator[CaptureRecord]:
+    """
+    Lê um arquivo de captura
+
+    Raises:
+        ValueError: Se o arquivo não for uma captura válida
+    """
+    with open(path, 'rb') as capture:
+        if capture.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"Arquivo de captura inválido: {path}")
+
+        while True:
+            header = capture.read(RECORD_HEADER.size)
+            if not header:
+                return
+            if len(header) < RECORD_HEADER.size:
+                raise ValueError("Arquivo de captura truncado")
+
+            timestamp, latency_us, status, unit_id, request_len, response_len = RECORD_HEADER.unpack(header)
+            request = capture.read(request_len)
+            response = capture.read(response_len)
+            if len(request) < request_len or len(response) < response_len:
+                raise ValueError("Arquivo de captura truncado")
+
+            yield CaptureRecord(timestamp, latency_us / 1e6, status, unit_id, request, response)
+
+
+class _FrameSplitter:
+    """Separa um fluxo TCP em ADUs Modbus completas"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data) -> Iterator[bytes]:
+        self._buffer += data
+        while len(self._buffer) >= 6:
+            length = _MBAP_LENGTH.unpack_from(self._buffer)[2]
+            size = 6 + length
+            if len(self._buffer) < size:
+                return
+            frame = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            yield frame
+
+
+class CapturingSocket:
+    """
+    Envoltório de socket que grava cada par requisição/resposta
+
+    Intercepta os métodos usados pelo cliente pymodbus e pelo codec enxuto e
+    delega todo o resto ao socket original, de modo que select() continua
+    funcionando via fileno(). Em conexões com pipeline (gateway), várias
+    requisições ficam pendentes ao mesmo tempo e só são dadas como sem
+    resposta quando o ID de transação é reutilizado ou a conexão é fechada.
+    """
+
+    def __init__(self, sock, recorder: TrafficRecorder, pipelined: bool = False):
+        self.raw = sock
+        self.recorder = recorder
+        self.pipelined = pipelined
+        self._tx = _FrameSplitter()
+        self._rx = _FrameSplitter()
+        self._pending: Dict[int, Tuple[float, float, int, bytes]] = {}
+        # Envio e recepção ocorrem em threads diferentes no gateway (thread leitora)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def _on_sent(self, data) -> List[int]:
+        """Registra as requisições enviadas; retorna os IDs de transação registrados"""
+        now = time.perf_counter()
+        registered = []
+        for frame in self._tx.feed(data):
+            transaction_id = _MBAP_LENGTH.unpack_from(frame)[0]
+            if self.pipelined:
+                self._flush_pending(now, transaction_id)
+            else:
+                # Cliente síncrono: requisições ainda pendentes ficaram sem resposta
+                self._flush_pending(now)
+            self._pending[transaction_id] = (time.time(), now, frame[6], frame[7:])
+            registered.append(transaction_id)
+        return registered
+
+    def _on_received(self, data) -> None:
+        now = time.perf_counter()
+        for frame in self._rx.feed(data):
+            transaction_id = _MBAP_LENGTH.unpack_from(frame)[0]
+            pending = self._pending.pop(transaction_id, None)
+            if pending is None:
+                continue
+            wall, started, unit_id, request = pending
+            self.recorder.record(wall, now - started, STATUS_OK, unit_id, request, frame[7:])
+
+    def _flush_pending(self, now: float, transaction_id: int = None) -> None:
+        if transaction_id is not None:
+            pending = self._pending.pop(transaction_id, None)
+            expired = [pending] if pending else []
+        else:
+            expired = list(self._pending.values())
+            self._pending.clear()
+
+        for wall, started, unit_id, request in expired:
+            self.recorder.record(wall, now - started, STATUS_NO_RESPONSE, unit_id, request)
+
+    def send(self, data, *args):
+        sent = self.raw.send(data, *args)
+        with self._lock:
+            self._on_sent(memoryview(data)[:sent])
+        return sent
+
+    def sendall(self, data, *args):
+        # Registra antes de enviar: em pipeline a thread leitora pode receber a
+        # resposta antes de sendall retornar
+        with self._lock:
+            registered = self._on_sent(data)
+        try:
+            self.raw.sendall(data, *args)
+        except OSError:
+            with self._lock:
+                for transaction_id in registered:
+                    self._pending.pop(transaction_id, None)
+            raise
+
+    def observe_received(self, data) -> None:
+        """Registra uma ADU lida diretamente do socket original (leitura iniciada antes do envoltório)"""
+        with self._lock:
+            self._on_received(data)
+
+    def recv(self, size, *args):
+        data = self.raw.recv(size, *args)
+        with self._lock:
+            self._on_received(data)
+        return data
+
+    def recv_into(self, buffer, nbytes=0, *args):
+        received = self.raw.recv_into(buffer, nbytes, *args)
+        with self._lock:
+            self._on_received(memoryview(buffer)[:received])
+        return received
+
+    def close(self):
+        with self._lock:
+            self._flush_pending(time.perf_counter())
+        self.raw.close()
@@ -0,0 +1,128 @@
+# backend/traffic_replay.py
+# Dispositivo Modbus TCP falso que reproduz uma captura de tráfego
+
+import logging
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from backend.traffic_capture import CaptureRecord, STATUS_NO_RESPONSE
+
+logger = logging.getLogger(__name__)
+
+_MBAP_HEADER = struct.Struct('>HHHB')
+
+# Código de exceção devolvido para requisições ausentes da captura (falha no dispositivo)
+UNKNOWN_REQUEST_EXCEPTION = 0x04
+
+
+class _ReplayHandler(socketserver.BaseRequestHandler):
+    """Atende uma conexão cliente respondendo com os PDUs gravados"""
+
+    def handle(self):
+        device: 'ReplayDevice' = self.server.device
+        sock = self.request
+        buffer = bytearray()
+
+        while True:
+            try:
+                data = sock.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+
+            while len(buffer) >= _MBAP_HEADER.size:
+                transaction_id, protocol_id, length, unit_id = _MBAP_HEADER.unpack_from(buffer)
+                size = 6 + length
+                if len(buffer) < size:
+                    break
+                request = bytes(buffer[_MBAP_HEADER.size:size])
+                del buffer[:size]
+
+                record = device.lookup(unit_id, request)
+                if record is None:
+                    logger.warning(f"⚠️ Requisição fora da captura: unit {unit_id}, PDU {request.hex()}")
+                    response = bytes((request[0] | 0x80, UNKNOWN_REQUEST_EXCEPTION))
+                    delay = 0.0
+                else:
+                    response = record.response
+                    delay = record.latency / device.speed
+
+                if delay > 0:
+                    time.sleep(delay)
+                if record is not None and record.status == STATUS_NO_RESPONSE:
+                    continue
+
+                sock.sendall(
+                    _MBAP_HEADER.pack(transaction_id, protocol_id, len(response) + 1, unit_id) + response
+                )
+
+
+class _ReplayServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class ReplayDevice:
+    """
+    Dispositivo falso que reproduz latências e respostas de uma captura
+
+    Cada requisição recebida é casada pelo par (unit id, PDU) com as
+    transações gravadas, na ordem original. Quando as gravações de uma
+    requisição se esgotam, a última continua sendo repetida.
+    """
+
+    def __init__(self, records: Iterable[CaptureRecord], host: str = '127.0.0.1',
+                 port: int = 0, speed: float = 1.0):
+        """
+        Prepara o dispositivo falso
+
+        Args:
+            records: Transações gravadas
+            host: Endereço de escuta
+            port: Porta de escuta (0 escolhe uma porta livre)
+            speed: Fator de aceleração das latências (2.0 responde duas vezes mais rápido)
+        """
+        self.speed = speed if speed > 0 else 1.0
+        self._lock = threading.Lock()
+        self._responses: Dict[Tuple[int, bytes], Deque[CaptureRecord]] = {}
+        for record in records:
+            self._responses.setdefault((record.unit_id, record.request), deque()).append(record)
+
+        self._server = _ReplayServer((host, port), _ReplayHandler)
+        self._server.device = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def lookup(self, unit_id: int, request: bytes) -> Optional[CaptureRecord]:
+        """Retorna a próxima transação gravada para a requisição, ou None"""
+        with self._lock:
+            records = self._responses.get((unit_id, request))
+            if not records:
+                return None
+            if len(records) > 1:
+                return records.popleft()
+            return records[0]
+
+    def start(self) -> None:
+        """Inicia o servidor em uma thread de fundo"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        host, port = self.address
+        logger.info(f"▶️ Dispositivo de replay escutando em {host}:{port}")
+
+    def serve_forever(self) -> None:
+        """Executa o servidor na thread atual"""
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,173 @@
+# benchmarks/bench_codec.py
+# Validação e benchmark do codec enxuto contra o enquadramento do pymodbus
+#
+# Uso: python -m benchmarks.bench_codec [iterações]
+
+import random
+import struct
+import sys
+import timeit
+
+from pymodbus.bit_read_message import ReadCoilsRequest, ReadDiscreteInputsRequest
+from pymodbus.bit_write_message import WriteMultipleCoilsRequest, WriteSingleCoilRequest
+from pymodbus.factory import ClientDecoder
+from pymodbus.framer.socket_framer import ModbusSocketFramer
+from pymodbus.register_read_message import (
+    ReadHoldingRegistersRequest,
+    ReadInputRegistersRequest,
+)
+from pymodbus.register_write_message import (
+    WriteMultipleRegistersRequest,
+    WriteSingleRegisterRequest,
+)
+
+from backend.modbus_codec import (
+    ModbusCodec,
+    pack_bits,
+    FC_READ_COILS,
+    FC_READ_DISCRETE_INPUTS,
+    FC_READ_HOLDING_REGISTERS,
+    FC_READ_INPUT_REGISTERS,
+    FC_WRITE_MULTIPLE_COILS,
+    FC_WRITE_MULTIPLE_REGISTERS,
+    FC_WRITE_SINGLE_COIL,
+    FC_WRITE_SINGLE_REGISTER,
+    COIL_ON,
+    COIL_OFF,
+)
+
+UNIT_ID = 1
+ADDRESS = 100
+COUNT = 125
+
+
+def _pymodbus_packet(framer: ModbusSocketFramer, message, transaction_id: int) -> bytes:
+    message.transaction_id = transaction_id
+    return framer.buildPacket(message)
+
+
+def _register_response(transaction_id: int, function_code: int, values) -> bytes:
+    payload = struct.pack(f'>BB{len(values)}H', function_code, len(values) * 2, *values)
+    return struct.pack('>HHHB', transaction_id, 0, len(payload) + 1, UNIT_ID) + payload
+
+
+def _bits_response(transaction_id: int, function_code: int, bits) -> bytes:
+    packed = pack_bits(bits)
+    payload = struct.pack('>BB', function_code, len(packed)) + packed
+    return struct.pack('>HHHB', transaction_id, 0, len(payload) + 1, UNIT_ID) + payload
+
+
+def _pymodbus_decode(framer: ModbusSocketFramer, packet: bytes):
+    results = []
+    framer.processIncomingPacket(packet, results.append, slave=UNIT_ID)
+    return results[0]
+
+
+def validate() -> None:
+    """Confere que o codec gera e interpreta exatamente o mesmo que o pymodbus"""
+    framer = ModbusSocketFramer(ClientDecoder())
+    codec = ModbusCodec()
+    rng = random.Random(0)
+
+    read_requests = (
+        (FC_READ_COILS, ReadCoilsRequest),
+        (FC_READ_DISCRETE_INPUTS, ReadDiscreteInputsRequest),
+        (FC_READ_HOLDING_REGISTERS, ReadHoldingRegistersRequest),
+        (FC_READ_INPUT_REGISTERS, ReadInputRegistersRequest),
+    )
+    for function_code, request_class in read_requests:
+        for count in (1, 7, 8, 9, COUNT):
+            ours = bytes(codec.build_read_request(function_code, UNIT_ID, ADDRESS, count))
+            theirs = _pymodbus_packet(
+                framer, request_class(ADDRESS, count, slave=UNIT_ID), codec.transaction_id
+            )
+            assert ours == theirs, (function_code, count, ours, theirs)
+
+    for value in (0, 1234, 65535):
+        ours = bytes(codec.build_write_single_request(FC_WRITE_SINGLE_REGISTER, UNIT_ID, ADDRESS, value))
+        theirs = _pymodbus_packet(
+            framer, WriteSingleRegisterRequest(ADDRESS, value, slave=UNIT_ID), codec.transaction_id
+        )
+        assert ours == theirs, ("FC06", value)
+
+    for value in (True, False):
+        ours = bytes(codec.build_write_single_request(
+            FC_WRITE_SINGLE_COIL, UNIT_ID, ADDRESS, COIL_ON if value else COIL_OFF
+        ))
+        theirs = _pymodbus_packet(
+            framer, WriteSingleCoilRequest(ADDRESS, value, slave=UNIT_ID), codec.transaction_id
+        )
+        assert ours == theirs, ("FC05", value)
+
+    values = [rng.randrange(65536) for _ in range(100)]
+    ours = bytes(codec.build_write_registers_request(UNIT_ID, ADDRESS, values))
+    theirs = _pymodbus_packet(
+        framer, WriteMultipleRegistersRequest(ADDRESS, values, slave=UNIT_ID), codec.transaction_id
+    )
+    assert ours == theirs, "FC16"
+
+    for count in (1, 8, 13, 800):
+        bits = [rng.randrange(2) for _ in range(count)]
+        ours = bytes(codec.build_write_coils_request(UNIT_ID, ADDRESS, bits))
+        theirs = _pymodbus_packet(
+            framer, WriteMultipleCoilsRequest(ADDRESS, [bool(b) for b in bits], slave=UNIT_ID),
+            codec.transaction_id
+        )
+        assert ours == theirs, ("FC15", count)
+
+    for function_code in (FC_READ_HOLDING_REGISTERS, FC_READ_INPUT_REGISTERS):
+        values = [rng.randrange(65536) for _ in range(COUNT)]
+        codec.build_read_request(function_code, UNIT_ID, ADDRESS, COUNT)
+        packet = _register_response(codec.transaction_id, function_code, values)
+        ours = codec.parse_registers(memoryview(packet), UNIT_ID, function_code, COUNT)
+        theirs = _pymodbus_decode(framer, packet).registers
+        assert list(ours) == theirs == values, function_code
+
+    for function_code in (FC_READ_COILS, FC_READ_DISCRETE_INPUTS):
+        for count in (1, 8, 13, 2000):
+            bits = [rng.randrange(2) for _ in range(count)]
+            codec.build_read_request(function_code, UNIT_ID, ADDRESS, count)
+            packet = _bits_response(codec.transaction_id, function_code, bits)
+            ours = codec.parse_bits(memoryview(packet), UNIT_ID, function_code, count)
+            theirs = [int(bit) for bit in _pymodbus_decode(framer, packet).bits[:count]]
+            assert list(ours) == theirs == bits, (function_code, count)
+
+    for function_code in (FC_WRITE_SINGLE_COIL, FC_WRITE_SINGLE_REGISTER,
+                          FC_WRITE_MULTIPLE_COILS, FC_WRITE_MULTIPLE_REGISTERS):
+        codec.build_read_request(function_code, UNIT_ID, ADDRESS, COUNT)
+        packet = struct.pack('>HHHBBHH', codec.transaction_id, 0, 6, UNIT_ID,
+                             function_code, ADDRESS, COUNT)
+        assert codec.parse_write_response(memoryview(packet), UNIT_ID, function_code) == (ADDRESS, COUNT)
+
+    print("✅ Codec equivalente ao pymodbus (FC01-FC06, FC15, FC16)")
+
+
+def benchmark(iterations: int) -> None:
+    """Compara o custo de montar a requisição e interpretar a resposta FC03"""
+    framer = ModbusSocketFramer(ClientDecoder())
+    codec = ModbusCodec()
+    values = list(range(COUNT))
+
+    def run_pymodbus():
+        request = ReadHoldingRegistersRequest(ADDRESS, COUNT, slave=UNIT_ID)
+        request.transaction_id = 1
+        framer.buildPacket(request)
+        registers = _pymodbus_decode(framer, response).registers
+        return {"success": True, "data": list(registers), "error": None}
+
+    def run_codec():
+        codec.build_read_request(FC_READ_HOLDING_REGISTERS, UNIT_ID, ADDRESS, COUNT)
+        registers = codec.parse_registers(response_view, UNIT_ID, FC_READ_HOLDING_REGISTERS, COUNT, 1)
+        return {"success": True, "data": registers, "error": None}
+
+    response = _register_response(1, FC_READ_HOLDING_REGISTERS, values)
+    response_view = memoryview(response)
+
+    for name, func in (("pymodbus", run_pymodbus), ("codec enxuto", run_codec)):
+        elapsed = min(timeit.repeat(func, number=iterations, repeat=3))
+        print(f"📊 {name:>13}: {elapsed / iterations * 1e6:8.2f} µs/leitura de {COUNT} registradores")
+
+
+if __name__ == '__main__':
+    validate()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,123 @@
+# benchmarks/replay_capture.py
+# Reproduz uma captura de tráfego contra um dispositivo falso local
+#
+# Uso:
+#   python -m benchmarks.replay_capture captura.bin [--speed 1.0] [--paced]
+#   python -m benchmarks.replay_capture captura.bin --serve --port 5020
+
+import argparse
+import logging
+import statistics
+import struct
+import time
+from typing import Callable, List, Optional
+
+from backend.modbus_manager import ModbusManager
+from backend.traffic_capture import CaptureRecord, STATUS_OK, read_capture
+from backend.traffic_replay import ReplayDevice
+
+_ADDRESS_VALUE = struct.Struct('>HH')
+
+
+def _operation(manager: ModbusManager, record: CaptureRecord) -> Optional[Callable[[], dict]]:
+    """Converte o PDU gravado na chamada equivalente do ModbusManager"""
+    if len(record.request) < 1 + _ADDRESS_VALUE.size:
+        return None
+
+    address, value = _ADDRESS_VALUE.unpack_from(record.request, 1)
+    function_code = record.function_code
+    # Mesma unidade da gravação: o dispositivo de replay indexa as respostas por (unidade, PDU)
+    unit_id = record.unit_id
+    if function_code == 0x03:
+        return lambda: manager.read_holding_registers(address, value, unit_id)
+    if function_code == 0x01:
+        return lambda: manager.read_coils(address, value, unit_id)
+    if function_code == 0x06:
+        return lambda: manager.write_single_register(address, value, unit_id)
+    if function_code == 0x05:
+        return lambda: manager.write_coil(address, 1 if value == 0xFF00 else 0, unit_id)
+    return None
+
+
+def _summary(label: str, latencies: List[float]) -> None:
+    if not latencies:
+        print(f"📊 {label}: sem amostras")
+        return
+    ms = sorted(latency * 1000 for latency in latencies)
+    percentiles = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+    print(
+        f"📊 {label:>9}: n={len(ms)} média={statistics.fmean(ms):.2f}ms "
+        f"p50={percentiles[49]:.2f}ms p95={percentiles[94]:.2f}ms "
+        f"p99={percentiles[98]:.2f}ms máx={ms[-1]:.2f}ms"
+    )
+
+
+def replay(records: List[CaptureRecord], speed: float, paced: bool, fast_codec: bool, timeout: int) -> None:
+    device = ReplayDevice(records, speed=speed)
+    device.start()
+    host, port = device.address
+
+    # Sem o laço de reconexão: uma transação sem resposta deve custar só o timeout,
+    # não timeout + espera por tentativa
+    manager = ModbusManager(host, port=port, timeout=timeout, fast_codec=fast_codec, max_retries=0)
+    if not manager.connect():
+        raise SystemExit("Não foi possível conectar ao dispositivo de replay")
+
+    original: List[float] = []
+    replayed: List[float] = []
+    skipped = 0
+    started = time.perf_counter()
+    first_timestamp = records[0].timestamp if records else 0.0
+
+    for record in records:
+        operation = _operation(manager, record)
+        if operation is None:
+            skipped += 1
+            continue
+
+        if paced:
+            # Respeita os intervalos originais entre requisições
+            wait = (record.timestamp - first_timestamp) / speed - (time.perf_counter() - started)
+            if wait > 0:
+                time.sleep(wait)
+
+        begin = time.perf_counter()
+        operation()
+        replayed.append(time.perf_counter() - begin)
+        if record.status == STATUS_OK:
+            original.append(record.latency)
+
+    elapsed = time.perf_counter() - started
+    manager.disconnect()
+    device.stop()
+
+    print(f"⏱️ {len(replayed)} transações reproduzidas em {elapsed:.2f}s ({skipped} ignoradas)")
+    _summary("original", original)
+    _summary("replay", replayed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay de capturas de tráfego Modbus")
+    parser.add_argument('capture', help="Arquivo de captura gravado pelo ModbusManager")
+    parser.add_argument('--speed', type=float, default=1.0, help="Fator de aceleração das latências")
+    parser.add_argument('--paced', action='store_true', help="Reproduz os intervalos originais entre requisições")
+    parser.add_argument('--fast-codec', action='store_true', help="Usa o codec enxuto nas leituras")
+    parser.add_argument('--timeout', type=int, default=2, help="Timeout do cliente em segundos")
+    parser.add_argument('--serve', action='store_true', help="Apenas serve o dispositivo falso")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5020)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    records = list(read_capture(args.capture))
+
+    if args.serve:
+        device = ReplayDevice(records, host=args.host, port=args.port, speed=args.speed)
+        print(f"▶️ Dispositivo de replay em {args.host}:{args.port} ({len(records)} transações)")
+        device.serve_forever()
+    else:
+        replay(records, args.speed, args.paced, args.fast_codec, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
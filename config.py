@@ -14,7 +14,13 @@ class ModbusConfig:
     DEFAULT_TIMEOUT: int = 10
     MAX_RETRIES: int = 3
     MAX_REGISTERS_READ: int = 125
+    MAX_COILS_READ: int = 2000
     MAX_REGISTER_VALUE: int = 65535
+    MAX_UNIT_ID: int = 255
+    GATEWAY_MODE: bool = os.environ.get('MODBUS_GATEWAY_MODE', '0') == '1'
+    FAST_CODEC: bool = os.environ.get('MODBUS_FAST_CODEC', '0') == '1'
+    CAPTURE_FILE: str = os.environ.get('MODBUS_CAPTURE_FILE', '')
+    CAPTURE_DIR: str = os.environ.get('MODBUS_CAPTURE_DIR', 'captures')
 
 
 @dataclass
@@ -24,6 +30,57 @@ class FlaskConfig:
     PORT: int = 5000
     DEBUG: bool = True
     SECRET_KEY: str = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+    ADMIN_TOKEN: str = os.environ.get('ADMIN_TOKEN', '')
+
+
+@dataclass
+class GatewayConfig:
+    """Configurações do modo gateway (várias unidades em uma conexão)"""
+    MAX_IN_FLIGHT: int = 16
+    MAX_IN_FLIGHT_PER_UNIT: int = 1
+    UNIT_FAILURE_THRESHOLD: int = 3
+    UNIT_COOLDOWN: float = 5.0
+
+
+@dataclass
+class ExportConfig:
+    """Configurações da exportação em massa da memória do dispositivo"""
+    MAX_ADDRESS: int = 65536
+    BLOCK_REGISTERS: int = 125
+    BLOCK_COILS: int = 2000
+    # Blocos acumulados antes de cada envio ao cliente
+    FLUSH_BLOCKS: int = 8
+
+
+@dataclass
+class RedundancyConfig:
+    """Configurações de dispositivos com endpoints redundantes"""
+    ENDPOINT_TIMEOUT: float = 1.0
+    ENDPOINT_COOLDOWN: float = 5.0
+    LATENCY_WINDOW: int = 200
+    MIN_SAMPLES: int = 20
+    EWMA_ALPHA: float = 0.2
+    FAILURE_PENALTY: float = 1.0
+    HEDGE_PERCENTILE: float = 0.95
+    HEDGE_DEFAULT_DELAY: float = 0.1
+    HEDGE_MIN_DELAY: float = 0.01
+
+
+@dataclass
+class AlarmConfig:
+    """Configurações do motor de alarmes"""
+    MAX_EVENTS: int = 1000
+    STREAM_KEEPALIVE: float = 15.0
+
+
+@dataclass
+class ProfilerConfig:
+    """Configurações do perfilamento sob demanda"""
+    DEFAULT_DURATION: float = 10.0
+    MAX_DURATION: float = 120.0
+    DEFAULT_INTERVAL: float = 0.005
+    MIN_INTERVAL: float = 0.001
+    TOP_FUNCTIONS: int = 25
 
 
 @dataclass
@@ -37,4 +94,9 @@ class LoggingConfig:
 # Instâncias das configurações
 modbus_config = ModbusConfig()
 flask_config = FlaskConfig()
+gateway_config = GatewayConfig()
+redundancy_config = RedundancyConfig()
+export_config = ExportConfig()
+alarm_config = AlarmConfig()
+profiler_config = ProfilerConfig()
 logging_config = LoggingConfig()
\ No newline at end of file